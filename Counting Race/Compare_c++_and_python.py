@@ -1,66 +1,284 @@
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import shutil
+import statistics
 import subprocess
+import sys
 import time
-import os
 
-def compile_cpp():
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_COUNT = 1000000000
+
+TIME_PATTERN = re.compile(r'Time taken:\s*([0-9.eE+-]+)')
+SUM_PATTERN = re.compile(r'Sum:\s*(\d+)')
+
+# Medians below this are timer noise, e.g. the closed-form variant, which
+# skips the loop
+MIN_MEASURABLE = 1e-4
+
+# Implementations in Counting_python.py, selected with its --mode option
+PYTHON_VARIANTS = ('loop', 'pool', 'numpy', 'closed')
+
+
+def find_compiler():
+    # Use clang++ for Mac (or g++ if available)
+    return shutil.which('clang++') or shutil.which('g++')
+
+
+def compiler_version(compiler):
+    result = subprocess.run([compiler, '--version'], capture_output=True, text=True)
+    return result.stdout.splitlines()[0] if result.stdout else compiler
+
+
+def compile_cpp(compiler, opt_level):
+    """Build Counting_C++.cpp at one optimization level and return the binary path"""
+    cpp_file = os.path.join(CURRENT_DIR, 'Counting_C++.cpp')
+    output_file = os.path.join(CURRENT_DIR, f'counting_cpp_{opt_level}')
     try:
-        # Use clang++ for Mac (or g++ if available)
-        compiler = 'clang++' if os.system('which clang++') == 0 else 'g++'
-        # Get current directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        cpp_file = os.path.join(current_dir, 'Counting_C++.cpp')
-        output_file = os.path.join(current_dir, 'counting_cpp')
-        
-        subprocess.run([compiler, cpp_file, '-o', output_file], check=True)
+        subprocess.run([compiler, f'-{opt_level}', cpp_file, '-o', output_file], check=True)
     except subprocess.CalledProcessError as e:
         print(f"Compilation error: {e}")
-        exit(1)
+        sys.exit(1)
+    return output_file
+
+
+def pin_to_cpu(cpu):
+    """Return a preexec_fn that pins the child process to one CPU, if the OS supports it"""
+    if cpu is None or not hasattr(os, 'sched_setaffinity'):
+        return None
+    return lambda: os.sched_setaffinity(0, {cpu})
+
+
+def default_cpu():
+    # Pin to the last CPU we're allowed on, which is least likely to be handling interrupts
+    if not hasattr(os, 'sched_getaffinity'):
+        return None
+    return max(os.sched_getaffinity(0))
+
+
+def run_once(command, cpu, count):
+    """Run one benchmark program and return (reported seconds, wall-clock seconds)"""
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, preexec_fn=pin_to_cpu(cpu))
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} exited with {result.returncode}: {result.stderr.strip()}")
+
+    match = TIME_PATTERN.search(result.stdout)
+    if match is None:
+        raise RuntimeError(f"No 'Time taken' line in output of {' '.join(command)}: {result.stdout!r}")
+
+    # Every program sums 1..count, so they must all get the same answer
+    total = SUM_PATTERN.search(result.stdout)
+    if total is None:
+        raise RuntimeError(f"No 'Sum' line in output of {' '.join(command)}: {result.stdout!r}")
+    if int(total.group(1)) != count * (count + 1) // 2:
+        raise RuntimeError(f"{' '.join(command)} computed the wrong sum: {total.group(1)}")
+    return float(match.group(1)), wall
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile, so it is always one of the measured samples
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'median': statistics.median(ordered),
+        'p95': percentile(ordered, 0.95),
+        'mean': statistics.fmean(ordered),
+        'stddev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'min': ordered[0],
+        'max': ordered[-1]
+    }
+
+
+def benchmark(name, command, runs, warmup, cpu, count):
+    """Run a program warmup + runs times and return its statistics"""
+    print(f"Running {name} ({warmup} warmup, {runs} runs)...", flush=True)
+    for _ in range(warmup):
+        run_once(command, cpu, count)
+
+    samples, wall_samples = [], []
+    for _ in range(runs):
+        reported, wall = run_once(command, cpu, count)
+        samples.append(reported)
+        wall_samples.append(wall)
+
+    result = summarize(samples)
+    result['wall_median'] = statistics.median(wall_samples)
+    result['samples'] = samples
+    result['command'] = command
+    return result
+
+
+def python_version(python):
+    result = subprocess.run([python, '-c', 'import sys, platform; '
+                             'print(platform.python_implementation(), sys.version.split()[0])'],
+                            capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def build_benchmarks(args):
+    """Return {name: command} for every compiler optimization level, interpreter and variant"""
+    benchmarks = {}
+    count = str(args.count)
+
+    compiler = args.compiler or find_compiler()
+    if compiler is None:
+        print("No C++ compiler found, skipping C++ benchmarks")
+    else:
+        print(f"Compiling C++ program with {compiler}...")
+        for opt_level in args.opt_levels:
+            benchmarks[f'cpp-{opt_level}'] = [compile_cpp(compiler, opt_level), count]
+
+    python_file = os.path.join(CURRENT_DIR, 'Counting_python.py')
+    for python in args.pythons:
+        if shutil.which(python) is None:
+            print(f"Interpreter {python} not found, skipping")
+            continue
+        for variant in args.variants:
+            name = f'python-{os.path.basename(python)}'
+            if variant != 'loop':
+                name += f'-{variant}'
+            command = [python, python_file, count, '--mode', variant]
+            if variant == 'pool' and args.workers:
+                command += ['--workers', str(args.workers)]
+            benchmarks[name] = command
+    return benchmarks
+
+
+def environment_info(args, benchmarks):
+    compiler = args.compiler or find_compiler()
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'pinned_cpu': args.cpu,
+        'compiler': compiler_version(compiler) if compiler else None,
+        'interpreters': {python: python_version(python) for python in args.pythons if shutil.which(python)},
+        'variants': args.variants,
+        'count': args.count,
+        'runs': args.runs,
+        'warmup': args.warmup
+    }
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """Return (name, baseline median, current median, ratio) for each regressed benchmark"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None or base['median'] < MIN_MEASURABLE:
+            continue
+        ratio = result['median'] / base['median']
+        if ratio > 1 + threshold:
+            regressions.append((name, base['median'], result['median'], ratio))
+    return regressions
+
+
+def print_results(results):
+    print("\nResults (seconds, as reported by each program):")
+    print("-" * 78)
+    print(f"{'benchmark':<22} {'median':>10} {'p95':>10} {'stddev':>10} {'min':>10} {'vs fastest':>12}")
+    fastest = min((r['median'] for r in results.values() if r['median'] >= MIN_MEASURABLE), default=None)
+    for name, r in sorted(results.items(), key=lambda item: item[1]['median']):
+        if r['median'] < MIN_MEASURABLE:
+            relative = "too fast"
+        else:
+            relative = f"{r['median'] / fastest:.1f}x"
+        print(f"{name:<22} {r['median']:>10.4f} {r['p95']:>10.4f} {r['stddev']:>10.4f} "
+              f"{r['min']:>10.4f} {relative:>12}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Race the C++ and Python counting programs")
+    parser.add_argument('-n', '--runs', type=int, default=5, help="measured runs per benchmark (default: 5)")
+    parser.add_argument('-w', '--warmup', type=int, default=1, help="unmeasured warmup runs (default: 1)")
+    parser.add_argument('--count', type=int, default=DEFAULT_COUNT, help="how far to count (default: 1e9)")
+    parser.add_argument('--opt-levels', default='O0,O2,O3',
+                        help="comma-separated compiler optimization levels (default: O0,O2,O3)")
+    parser.add_argument('--compiler', help="C++ compiler (default: clang++ or g++)")
+    parser.add_argument('--python', dest='pythons', default=f'{sys.executable},pypy3',
+                        help="comma-separated interpreters; missing ones are skipped (default: this python, pypy3)")
+    parser.add_argument('--variants', default='loop',
+                        help=f"comma-separated Python implementations to race: {', '.join(PYTHON_VARIANTS)} "
+                             f"or 'all' (default: loop)")
+    parser.add_argument('--workers', type=int, help="processes for the pool variant (default: all CPUs)")
+    parser.add_argument('--cpu', type=int, default=default_cpu(),
+                        help="CPU to pin benchmarks to, where supported (default: last available CPU)")
+    parser.add_argument('--no-pin', action='store_true', help="don't pin benchmarks to a CPU")
+    parser.add_argument('--json', help="write results to this JSON file")
+    parser.add_argument('--baseline', help="JSON results from an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="flag benchmarks whose median is this much slower than the baseline (default: 0.10)")
+    args = parser.parse_args()
+
+    args.opt_levels = [level.strip().lstrip('-') for level in args.opt_levels.split(',') if level.strip()]
+    args.pythons = [python.strip() for python in args.pythons.split(',') if python.strip()]
+    if args.variants == 'all':
+        args.variants = list(PYTHON_VARIANTS)
+    else:
+        args.variants = [variant.strip() for variant in args.variants.split(',') if variant.strip()]
+    unknown = set(args.variants) - set(PYTHON_VARIANTS)
+    if unknown:
+        parser.error(f"unknown variants: {', '.join(sorted(unknown))}")
+    if args.no_pin or not hasattr(os, 'sched_setaffinity'):
+        args.cpu = None
+    elif 'pool' in args.variants and args.cpu is not None:
+        # Pinning every process to one CPU would defeat the pool
+        print("Not pinning to a CPU since the pool variant needs all of them")
+        args.cpu = None
+    return args
 
-def run_cpp():
-    try:
-        # Get current directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        cpp_executable = os.path.join(current_dir, 'counting_cpp')
-        
-        result = subprocess.run([cpp_executable], capture_output=True, text=True)
-        return float(result.stdout.split(':')[1].split()[0])
-    except (FileNotFoundError, subprocess.CalledProcessError) as e:
-        print(f"Error running C++ program: {e}")
-        exit(1)
-
-def run_python():
-    try:
-        # Get current directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        python_file = os.path.join(current_dir, 'Counting_python.py')
-        
-        result = subprocess.run(['python', python_file], capture_output=True, text=True)
-        return float(result.stdout.split(':')[1].split()[0])
-    except subprocess.CalledProcessError as e:
-        print(f"Error running Python program: {e}")
-        exit(1)
 
 def main():
-    print("Compiling C++ program...")
-    compile_cpp()
-    
-    print("\nRunning both programs...")
-    print("-" * 40)
-    
-    # Run C++
-    print("Running C++ version...")
-    cpp_time = run_cpp()
-    
-    # Run Python
-    print("Running Python version...")
-    python_time = run_python()
-    
-    print("\nResults:")
+    args = parse_args()
+    benchmarks = build_benchmarks(args)
+    if args.cpu is not None:
+        print(f"Pinning benchmarks to CPU {args.cpu}")
+    else:
+        print("Not pinning benchmarks to a CPU")
+
+    print("\nRunning benchmarks...")
     print("-" * 40)
-    print(f"C++ Time:    {cpp_time:.2f} seconds")
-    print(f"Python Time: {python_time:.2f} seconds")
-    print(f"Difference:  {python_time - cpp_time:.2f} seconds")
-    print(f"Python is {python_time/cpp_time:.1f}x slower than C++")
+    results = {}
+    for name, command in benchmarks.items():
+        try:
+            results[name] = benchmark(name, command, args.runs, args.warmup, args.cpu, args.count)
+        except RuntimeError as e:
+            print(f"Error running {name}: {e}")
+
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'environment': environment_info(args, benchmarks), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        baseline_count = baseline.get('environment', {}).get('count')
+        if baseline_count != args.count:
+            print(f"\nBaseline counted to {baseline_count} but this run counted to {args.count}, not comparing")
+            sys.exit(2)
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions (more than {args.threshold:.0%} slower than {args.baseline}):")
+            for name, before, after, ratio in regressions:
+                print(f"  {name}: {before:.4f}s -> {after:.4f}s ({ratio:.2f}x)")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,19 @@
 #include <iostream>
 #include <chrono>
+#include <cstdlib>
+
+int main(int argc, char* argv[]) {
+    // Optional count on the command line, for quicker benchmark runs
+    long long count = argc > 1 ? std::atoll(argv[1]) : 1000000000;
 
-int main() {
     // Start timing
     auto start = std::chrono::high_resolution_clock::now();
 
-    for (long long i = 1; i <= 1000000000; i++) {
-        // Just count, no printing
+    // Sum as we count. The sum goes into a volatile so the optimizer can't
+    // drop the loop (or replace it with a formula) at -O2 and -O3.
+    volatile long long sum = 0;
+    for (long long i = 1; i <= count; i++) {
+        sum = sum + i;
     }
 
     // End timing
@@ -16,6 +23,7 @@ int main() {
     std::chrono::duration<double> duration = end - start;
     
     std::cout << "Time taken: " << duration.count() << " seconds" << std::endl;
+    std::cout << "Sum: " << sum << std::endl;
     
     return 0;
 }
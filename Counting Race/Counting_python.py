@@ -1,9 +1,77 @@
+import argparse
+import os
 import time
+from multiprocessing import Pool
 
-start_time = time.time()
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-for i in range(1, 1000000001):
-    pass  # Just count without printing
+MODES = ('loop', 'pool', 'numpy', 'closed')
 
-end_time = time.time()
-print(f"Time taken: {end_time - start_time:.2f} seconds")
+
+def sum_range(bounds):
+    # Worker for pool mode: sum one chunk of the range with the built-in sum
+    start, end = bounds
+    return sum(range(start, end))
+
+
+def pool_sum(count, workers):
+    """Sum 1..count split into chunks across a process pool"""
+    chunks = workers * 4
+    step = count // chunks + 1
+    bounds = [(start, min(start + step, count + 1)) for start in range(1, count + 1, step)]
+    with Pool(workers) as pool:
+        return sum(pool.map(sum_range, bounds))
+
+
+def numpy_sum(count, block_size):
+    """Sum 1..count a block at a time, so memory stays at one block however large count is"""
+    total = 0
+    for start in range(1, count + 1, block_size):
+        end = min(start + block_size, count + 1)
+        total += int(numpy.arange(start, end, dtype=numpy.int64).sum())
+    return total
+
+
+def closed_form_sum(count):
+    """Sum 1..count with Gauss's formula, which is what an optimizing compiler does with the loop"""
+    return count * (count + 1) // 2
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sum the numbers from 1 to count and time it")
+    # Optional count on the command line, for quicker benchmark runs
+    parser.add_argument('count', type=int, nargs='?', default=1000000000)
+    parser.add_argument('--mode', choices=MODES, default='loop',
+                        help="loop: plain for loop (default), pool: multiprocessing chunks, "
+                             "numpy: vectorized blocks, closed: closed-form formula")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="processes for pool mode")
+    parser.add_argument('--block-size', type=int, default=1 << 20, help="numbers per block in numpy mode")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    count = args.count
+    if args.mode == 'numpy' and numpy is None:
+        raise SystemExit("numpy mode requires numpy (pip install numpy)")
+
+    start_time = time.perf_counter()
+
+    if args.mode == 'loop':
+        # Sum as we count, the same work as the C++ loop
+        total = 0
+        for i in range(1, count + 1):
+            total += i
+    elif args.mode == 'pool':
+        total = pool_sum(count, args.workers)
+    elif args.mode == 'numpy':
+        total = numpy_sum(count, args.block_size)
+    else:
+        total = closed_form_sum(count)
+
+    end_time = time.perf_counter()
+    print(f"Time taken: {end_time - start_time:.6f} seconds")
+    print(f"Sum: {total}")
@@ -1,39 +1,278 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
+import sys
+import json
+import argparse
 from dotenv import load_dotenv
-import google.generativeai as genai
+from stub_model import StubModel, stub_embedding
+from session_store import SessionStore
+from limiter import InFlightLimiter
+from response_cache import ResponseCache
+
+try:
+    import google.generativeai as genai
+    from google.api_core.exceptions import DeadlineExceeded
+    TIMEOUT_ERRORS = (TimeoutError, DeadlineExceeded)
+except ImportError:
+    genai = None
+    TIMEOUT_ERRORS = (TimeoutError,)
+
+try:
+    import waitress
+except ImportError:
+    waitress = None
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=['X-Session-ID'])  # Enable CORS for all routes
 
 # Load environment variables
 load_dotenv()
 
-# Configure the Gemini API
-genai.configure(api_key=os.getenv('gemini_api_key'))
+
+def create_model():
+    # JAVIS_MODEL=stub swaps in a local echo model for tests and load testing
+    if os.getenv('JAVIS_MODEL') == 'stub':
+        return StubModel()
+    if genai is None:
+        raise RuntimeError("The Gemini model requires google-generativeai (pip install google-generativeai)")
+
+    # Configure the Gemini API
+    genai.configure(api_key=os.getenv('gemini_api_key'))
+    return genai.GenerativeModel('gemini-pro')
+
+
+def create_embedder():
+    # Embeddings for matching near-duplicate prompts in the response cache
+    if os.getenv('JAVIS_MODEL') == 'stub':
+        return stub_embedding
+    return lambda text: genai.embed_content(model='models/embedding-001', content=text)['embedding']
+
 
 # Create a model instance
-model = genai.GenerativeModel('gemini-pro')
+model = create_model()
+
+# One chat per client session, so users don't share a conversation
+sessions = SessionStore(
+    model,
+    max_sessions=int(os.getenv('JAVIS_MAX_SESSIONS', '1000')),
+    idle_timeout=float(os.getenv('JAVIS_SESSION_IDLE_MINUTES', '30')) * 60,
+    max_history_tokens=int(os.getenv('JAVIS_MAX_HISTORY_TOKENS', '4000'))
+)
+
+# Model calls allowed at once; anything over this is rejected with a 503
+limiter = InFlightLimiter(int(os.getenv('JAVIS_MAX_IN_FLIGHT', '32')))
+
+# Seconds a single model call may take before the request fails with a 504
+REQUEST_TIMEOUT = float(os.getenv('JAVIS_REQUEST_TIMEOUT', '30'))
+
+# Replies to repeated prompts; JAVIS_SEMANTIC_CACHE=1 also matches near-duplicates
+cache = ResponseCache(
+    max_entries=int(os.getenv('JAVIS_CACHE_MAX_ENTRIES', '1000')),
+    ttl=float(os.getenv('JAVIS_CACHE_TTL_MINUTES', '60')) * 60,
+    embed=create_embedder() if os.getenv('JAVIS_SEMANTIC_CACHE') == '1' else None,
+    similarity_threshold=float(os.getenv('JAVIS_SEMANTIC_THRESHOLD', '0.95'))
+)
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def session_id_from(data):
+    # Clients pass the id back in the body or a header; start a new session otherwise
+    return data.get('session_id') or request.headers.get('X-Session-ID') or sessions.new_session_id()
+
+
+def admit(session_id):
+    """Reserve the session for one request, or return an error response
+
+    Fails fast rather than queue: a session that already has a request
+    running answers 429.
+    """
+    session = sessions.get(session_id)
+    if not session.lock.acquire(blocking=False):
+        return None, (jsonify({'error': 'A request for this session is already in progress'}), 429,
+                      {'Retry-After': '1'})
+    return session, None
+
+
+def busy_response():
+    return jsonify({'error': 'Server is busy, try again shortly'}), 503, {'Retry-After': '1'}
+
+
+def cached_reply(session, user_message):
+    """Answer from the response cache if possible, recording the exchange in the session"""
+    sessions.trim(session)
+    reply = cache.get(user_message, session.chat.history)
+    if reply is not None:
+        sessions.record(session, user_message, reply)
+    return reply
 
-# Initialize chat
-chat = model.start_chat(history=[])
 
 @app.route('/chat', methods=['POST'])
 def chat_endpoint():
     try:
         data = request.json
         user_message = data.get('message')
-        
+
         if not user_message:
             return jsonify({'error': 'No message provided'}), 400
 
-        # Get response from the model
-        response = chat.send_message(user_message)
-        return jsonify({'response': response.text})
-    
+        session_id = session_id_from(data)
+        session, error = admit(session_id)
+        if error:
+            return error
+
+        try:
+            reply = cached_reply(session, user_message)
+            if reply is None:
+                # Only model calls count against the in-flight limit, cache hits are free
+                if not limiter.try_acquire():
+                    return busy_response()
+                try:
+                    history = list(session.chat.history)
+
+                    # Get response from the model
+                    response = session.chat.send_message(user_message, request_options={'timeout': REQUEST_TIMEOUT})
+                    reply = response.text
+                finally:
+                    limiter.release()
+                cache.put(user_message, history, reply)
+        finally:
+            session.lock.release()
+        return jsonify({'response': reply, 'session_id': session_id})
+
+    except TIMEOUT_ERRORS:
+        limiter.record_timeout()
+        return jsonify({'error': 'The model took too long to respond'}), 504
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream_endpoint():
+    """Same as /chat, but streams the reply as Server-Sent Events
+
+    Emits a 'token' event for each chunk as the model produces it, then a
+    single 'done' event, or an 'error' event if the model fails mid-reply.
+    """
+    data = request.json or {}
+    user_message = data.get('message')
+
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+
+    session_id = session_id_from(data)
+    session, error = admit(session_id)
+    if error:
+        return error
+
+    try:
+        reply = cached_reply(session, user_message)
+    except Exception as e:
+        session.lock.release()
+        return jsonify({'error': str(e)}), 500
+
+    holds_slot = reply is None
+    if holds_slot and not limiter.try_acquire():
+        session.lock.release()
+        return busy_response()
+
+    def generate():
+        # Send something straight away so the client sees the response start
+        # before the model has produced its first token
+        yield ": stream open\n\n"
+        if reply is not None:
+            yield sse_event('token', {'token': reply})
+            yield sse_event('done', {})
+            return
+
+        history = None
+        finished = False
+        try:
+            history = list(session.chat.history)
+            chunks = session.chat.send_message(user_message, stream=True,
+                                               request_options={'timeout': REQUEST_TIMEOUT})
+            tokens = []
+            for chunk in chunks:
+                if chunk.text:
+                    tokens.append(chunk.text)
+                    yield sse_event('token', {'token': chunk.text})
+            finished = True
+            cache.put(user_message, history, ''.join(tokens))
+            yield sse_event('done', {})
+        except TIMEOUT_ERRORS:
+            limiter.record_timeout()
+            yield sse_event('error', {'error': 'The model took too long to respond'})
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+        finally:
+            # A stream that stopped early (timeout, error or the client going
+            # away, which closes this generator) leaves the chat session
+            # unusable until its history is reset, so put back the old one
+            if not finished and history is not None:
+                session.chat.history = history
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'X-Session-ID': session_id,
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop reverse proxies from buffering the stream
+    })
+
+    def release():
+        session.lock.release()
+        if holds_slot:
+            limiter.release()
+
+    # The session and slot are held until the stream finishes or the client
+    # goes away, even if the generator never gets to run
+    response.call_on_close(release)
+    return response
+
+
+@app.route('/stats', methods=['GET'])
+def stats_endpoint():
+    return jsonify({'requests': limiter.stats(), 'sessions': sessions.stats(), 'cache': cache.stats()})
+
+
+def serve(host='127.0.0.1', port=5001, threads=None):
+    """Run the app on a production WSGI server
+
+    Model calls are blocking I/O, so each request runs on its own worker
+    thread and a slow model round trip never holds up other clients. A
+    few threads beyond the in-flight limit are kept free so that requests
+    over the limit get their 503 immediately instead of waiting for a
+    worker.
+    """
+    threads = threads or limiter.max_in_flight + 8
+    if waitress is not None:
+        print(f"Serving on http://{host}:{port} with {threads} threads")
+        waitress.serve(app, host=host, port=port, threads=threads, connection_limit=threads * 4)
+    else:
+        print("waitress not installed (pip install waitress), using Flask's threaded server")
+        app.run(host=host, port=port, threaded=True)
+
+
+def main():
+    if len(sys.argv) == 1:
+        app.run(debug=True, port=5001)
+        return
+
+    parser = argparse.ArgumentParser(description="Javis chat backend")
+    parser.add_argument('--serve', action='store_true', help="run on a production server instead of the dev server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--threads', type=int, help="worker threads (default: in-flight limit + 8)")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.host, args.port, args.threads)
+    else:
+        app.run(debug=True, host=args.host, port=args.port)
+
+
 if __name__ == "__main__":
-    app.run(debug=True, port=5001)
+    main()
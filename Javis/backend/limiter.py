@@ -0,0 +1,45 @@
+import threading
+
+
+class InFlightLimiter:
+    """Caps how many model calls run at once and rejects the rest straight away
+
+    Rejecting with a fast 503 when every slot is busy keeps latency
+    bounded for the requests that are accepted, instead of letting a
+    backlog queue up behind slow model round trips.
+    """
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a slot if one is free, without waiting"""
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.accepted += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts
+            }
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def post_chat(url, session_id, message, timeout):
+    """Send one /chat request and return (status, seconds)"""
+    body = json.dumps({'message': message, 'session_id': session_id}).encode()
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = None
+    return status, time.perf_counter() - start
+
+
+def run_level(url, concurrency, duration, timeout):
+    """Keep `concurrency` clients sending back-to-back requests for `duration` seconds"""
+    results = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(n):
+        session_id = f'load-{concurrency}-{n}'
+        i = 0
+        while time.perf_counter() < stop_at:
+            # Unique across levels too, so no request is answered from the response cache
+            status, elapsed = post_chat(url, session_id, f'load test message {concurrency}-{n}-{i}', timeout)
+            with lock:
+                results.append((status, elapsed))
+            if status in (429, 503):
+                # Brief back-off so rejected clients don't spin on the server
+                time.sleep(0.05)
+            i += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    ok = sorted(elapsed for status, elapsed in results if status == 200)
+    return {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'ok': len(ok),
+        'rejected': sum(1 for status, _ in results if status in (429, 503)),
+        'errors': sum(1 for status, _ in results if status not in (200, 429, 503)),
+        'throughput': len(ok) / wall,
+        'p50': statistics.median(ok) if ok else 0.0,
+        'p95': ok[int(len(ok) * 0.95)] if ok else 0.0
+    }
+
+
+def start_stub_server(port, max_in_flight, token_delay):
+    """Run the backend with the stub model on a background thread"""
+    os.environ['JAVIS_MODEL'] = 'stub'
+    os.environ['JAVIS_MAX_IN_FLIGHT'] = str(max_in_flight)
+    os.environ['JAVIS_STUB_DELAY'] = str(token_delay)
+    # Measure the model path only: cache hits would inflate the throughput
+    os.environ['JAVIS_CACHE_MAX_ENTRIES'] = '0'
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    import chatbot
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', port, chatbot.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the Javis /chat endpoint at increasing concurrency. "
+                    "Starts a local backend with the stub model unless --url is given.")
+    parser.add_argument('--url', help="chat endpoint of a running backend, e.g. http://127.0.0.1:5001/chat")
+    parser.add_argument('-c', '--concurrency', default='1,2,4,8,16,32,64',
+                        help="comma-separated client counts (default: 1,2,4,8,16,32,64)")
+    parser.add_argument('-d', '--duration', type=float, default=5.0, help="seconds per level (default: 5)")
+    parser.add_argument('--timeout', type=float, default=30.0, help="client timeout in seconds (default: 30)")
+    parser.add_argument('--port', type=int, default=5055, help="port for the local stub server")
+    parser.add_argument('--max-in-flight', type=int, default=32, help="in-flight limit of the local stub server")
+    parser.add_argument('--token-delay', type=float, default=0.05, help="stub model seconds per token")
+    args = parser.parse_args()
+
+    url = args.url
+    server = None
+    if url is None:
+        server = start_stub_server(args.port, args.max_in_flight, args.token_delay)
+        url = f'http://127.0.0.1:{args.port}/chat'
+        print(f"Stub backend on {url} (max in flight {args.max_in_flight}, {args.token_delay}s per token)")
+
+    print(f"{'clients':>8} {'requests':>9} {'ok':>6} {'rejected':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(',')):
+            r = run_level(url, concurrency, args.duration, args.timeout)
+            print(f"{r['concurrency']:>8} {r['requests']:>9} {r['ok']:>6} {r['rejected']:>9} {r['errors']:>7} "
+                  f"{r['throughput']:>8.1f} {r['p50'] * 1000:>8.0f} {r['p95'] * 1000:>8.0f}")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
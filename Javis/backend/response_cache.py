@@ -0,0 +1,201 @@
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from session_store import content_role, content_text
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def normalize_prompt(text):
+    """Fold case, whitespace and trailing punctuation so trivial variants match"""
+    return re.sub(r'\s+', ' ', text).strip().rstrip('?!.').strip().lower()
+
+
+def context_key(history):
+    """Fingerprint of the conversation so far; replies are only reused in the same context"""
+    turns = [(content_role(content), content_text(content)) for content in history]
+    return hashlib.sha256(json.dumps(turns).encode()).hexdigest()
+
+
+def unit_vector(vector):
+    """Scale an embedding to length 1, so cosine similarity is a plain dot product"""
+    if numpy is not None:
+        array = numpy.asarray(vector, dtype=numpy.float32)
+        norm = float(numpy.linalg.norm(array))
+        return array / norm if norm else array
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+def best_match(query, candidates, threshold):
+    """Key of the (key, unit vector) candidate most similar to query, if any reaches threshold"""
+    if not candidates:
+        return None
+    if numpy is not None:
+        scores = numpy.stack([vector for _, vector in candidates]) @ query
+        best = int(scores.argmax())
+        return candidates[best][0] if scores[best] >= threshold else None
+
+    best_key, best_score = None, threshold
+    for key, vector in candidates:
+        score = sum(x * y for x, y in zip(query, vector))
+        if score >= best_score:
+            best_key, best_score = key, score
+    return best_key
+
+
+class CacheEntry:
+    def __init__(self, context, response, expires, embedding=None):
+        self.context = context
+        self.response = response
+        self.expires = expires
+        self.embedding = embedding
+
+
+class ResponseCache:
+    """Model replies keyed by normalized prompt and conversation context
+
+    Exact lookups hash the normalized prompt together with the history the
+    model would see, so the same question in the same context is answered
+    without a model round trip. If an embed function is given, a miss
+    falls back to the most similar cached prompt in the same context whose
+    cosine similarity is at least similarity_threshold. Embeddings are
+    stored as unit vectors (NumPy arrays when NumPy is installed) and scored
+    outside the lock, so a miss doesn't hold up other requests.
+
+    Entries expire after ttl seconds, and the least recently used entry is
+    evicted once there are more than max_entries.
+    """
+    def __init__(self, max_entries=1000, ttl=60 * 60, embed=None, similarity_threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.entries = OrderedDict()
+        self.by_context = {}  # context -> keys of its entries, for similarity search
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.embed_errors = 0
+        # Embeddings computed by get() for misses, so put() doesn't embed the prompt again
+        self._recent_embeddings = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(prompt, context):
+        return hashlib.sha256(f'{context}\0{prompt}'.encode()).hexdigest()
+
+    def _embedding(self, prompt):
+        with self._lock:
+            embedding = self._recent_embeddings.get(prompt)
+        if embedding is not None:
+            return embedding
+
+        try:
+            embedding = unit_vector(self.embed(prompt))
+        except Exception:
+            # Similarity matching is best effort, never fail a request over it
+            with self._lock:
+                self.embed_errors += 1
+            return None
+
+        with self._lock:
+            self._recent_embeddings[prompt] = embedding
+            if len(self._recent_embeddings) > 256:
+                self._recent_embeddings.popitem(last=False)
+        return embedding
+
+    def get(self, prompt, history):
+        """Return the cached reply for prompt in this context, or None"""
+        prompt = normalize_prompt(prompt)
+        context = context_key(history)
+        key = self._key(prompt, context)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires <= now:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.response
+            if self.embed is None or not self.by_context.get(context):
+                self.misses += 1
+                return None
+
+        # Embed outside the lock, it may be a network call
+        embedding = self._embedding(prompt)
+        if embedding is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Take a snapshot of the candidates under the lock but score them
+        # outside it, so a context with many entries doesn't stall other lookups
+        with self._lock:
+            candidates = []
+            for candidate in self.by_context.get(context, ()):
+                entry = self.entries[candidate]
+                if entry.embedding is not None and entry.expires > now:
+                    candidates.append((candidate, entry.embedding))
+        best_key = best_match(embedding, candidates, self.similarity_threshold)
+
+        with self._lock:
+            # The match may have been evicted while it was being scored
+            entry = self.entries.get(best_key) if best_key is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(best_key)
+            self.semantic_hits += 1
+            return entry.response
+
+    def put(self, prompt, history, response):
+        """Cache a reply the model gave to prompt in this context"""
+        prompt = normalize_prompt(prompt)
+        context = context_key(history)
+        key = self._key(prompt, context)
+        embedding = self._embedding(prompt) if self.embed is not None else None
+
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = CacheEntry(context, response, time.monotonic() + self.ttl, embedding)
+            self.by_context.setdefault(context, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        keys = self.by_context[entry.context]
+        keys.discard(key)
+        if not keys:
+            del self.by_context[entry.context]
+
+    def stats(self):
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                'exact_hits': self.exact_hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self.entries),
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'embed_errors': self.embed_errors
+            }
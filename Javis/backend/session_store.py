@@ -0,0 +1,117 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Rough size of a token in characters, good enough to budget prompt size
+# without a count_tokens round trip to the API on every request
+CHARS_PER_TOKEN = 4
+
+
+def content_text(content):
+    """Text of one history entry, either a Gemini Content or a plain dict"""
+    parts = content['parts'] if isinstance(content, dict) else content.parts
+    return ''.join(part if isinstance(part, str) else getattr(part, 'text', '') for part in parts)
+
+
+def content_role(content):
+    return content['role'] if isinstance(content, dict) else content.role
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def trim_history(history, max_tokens):
+    """Drop the oldest user/model turns until the history fits in max_tokens
+
+    Turns are dropped in pairs so the history always starts with a user
+    message, which is what the model expects.
+    """
+    sizes = [estimate_tokens(content_text(content)) for content in history]
+    total = sum(sizes)
+    start = 0
+    while total > max_tokens and start < len(history):
+        total -= sum(sizes[start:start + 2])
+        start += 2
+    return history[start:]
+
+
+class Session:
+    """One user's chat, with a lock so their requests run one at a time"""
+    def __init__(self, chat):
+        self.chat = chat
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """Chat sessions keyed by session id, with LRU and idle-time eviction
+
+    Holds at most max_sessions chats; the least recently used one is
+    dropped when a new session would go over the limit, and any session
+    idle for longer than idle_timeout seconds is dropped on the next
+    lookup. Before each message the session's history is trimmed to
+    max_history_tokens, so the prompt sent to the model stays the same
+    size however long the conversation runs.
+    """
+    def __init__(self, model, max_sessions=1000, idle_timeout=30 * 60, max_history_tokens=4000):
+        self.model = model
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_history_tokens = max_history_tokens
+        self.sessions = OrderedDict()
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_session_id():
+        return uuid.uuid4().hex
+
+    def get(self, session_id):
+        """Return the Session for session_id, starting a new chat if needed"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = Session(self.model.start_chat(history=[]))
+                self.sessions[session_id] = session
+                while len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self.sessions.move_to_end(session_id)
+            session.last_used = now
+            return session
+
+    def _evict_idle(self, now):
+        # Sessions are in last-used order, so the idle ones are at the front
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if now - session.last_used <= self.idle_timeout:
+                break
+            del self.sessions[session_id]
+            self.evictions += 1
+
+    def trim(self, session):
+        """Trim a session's history to the token budget (call with session.lock held)"""
+        history = list(session.chat.history)
+        trimmed = trim_history(history, self.max_history_tokens)
+        if len(trimmed) != len(history):
+            session.chat.history = trimmed
+
+    def record(self, session, message, reply):
+        """Add an exchange that was answered without calling the model (call with session.lock held)"""
+        session.chat.history = list(session.chat.history) + [
+            {'role': 'user', 'parts': [message]},
+            {'role': 'model', 'parts': [reply]}
+        ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self.sessions),
+                'max_sessions': self.max_sessions,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,112 @@
+import hashlib
+import math
+import os
+import time
+
+
+def stub_embedding(text, dimensions=256):
+    """Deterministic embedding from hashed character trigrams, for local testing
+
+    Texts that share most of their trigrams get a high cosine similarity,
+    which is enough to exercise similarity matching without an API call.
+    """
+    vector = [0.0] * dimensions
+    padded = f'  {text.lower()}  '
+    for i in range(len(padded) - 2):
+        digest = hashlib.blake2b(padded[i:i + 3].encode(), digest_size=4).digest()
+        vector[int.from_bytes(digest, 'little') % dimensions] += 1.0
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class StubChunk:
+    """One streamed piece of a reply, shaped like a Gemini response chunk"""
+    def __init__(self, text):
+        self.text = text
+
+
+class StubResponse:
+    """Reply from StubChat.send_message, iterable when streamed like Gemini's"""
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    @property
+    def text(self):
+        return ''.join(chunk.text for chunk in self.chunks)
+
+
+class IncompleteIterationError(Exception):
+    """Raised on history access after a streamed reply wasn't read to the end"""
+
+
+class StubChat:
+    """Stand-in for a Gemini chat session that echoes the message back
+
+    Each word of the reply takes token_delay seconds to "generate", so
+    streaming and latency can be tested without an API key or network.
+    Like the Gemini client, a request_options timeout raises once the
+    reply takes longer than that to produce, and a streamed reply that
+    isn't read to the end leaves the session broken: reading history
+    raises until rewind() is called or history is assigned.
+    """
+    def __init__(self, history=None, token_delay=0.05):
+        self._history = list(history or [])
+        self._incomplete = False
+        self.token_delay = token_delay
+
+    @property
+    def history(self):
+        if self._incomplete:
+            raise IncompleteIterationError(
+                "The last streamed reply wasn't read to the end; call rewind() or set history")
+        return self._history
+
+    @history.setter
+    def history(self, history):
+        self._history = list(history or [])
+        self._incomplete = False
+
+    def rewind(self):
+        """Drop the last exchange, or the unfinished one if a stream was abandoned"""
+        if self._incomplete:
+            self._incomplete = False
+            return
+        del self._history[-2:]
+
+    def _reply_words(self, message):
+        words = f"You said: {message}".split(' ')
+        return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+    def _generate(self, message, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        reply = []
+        for word in self._reply_words(message):
+            if deadline is not None and time.monotonic() + self.token_delay > deadline:
+                raise TimeoutError("Stub model request timed out")
+            time.sleep(self.token_delay)
+            reply.append(word)
+            yield StubChunk(word)
+        self._history.append({'role': 'user', 'parts': [message]})
+        self._history.append({'role': 'model', 'parts': [''.join(reply)]})
+        self._incomplete = False
+
+    def send_message(self, message, stream=False, request_options=None):
+        timeout = (request_options or {}).get('timeout')
+        if stream:
+            self._incomplete = True
+            return self._generate(message, timeout)
+        return StubResponse(list(self._generate(message, timeout)))
+
+
+class StubModel:
+    """Stand-in for genai.GenerativeModel, selected with JAVIS_MODEL=stub"""
+    def __init__(self, token_delay=None):
+        if token_delay is None:
+            token_delay = float(os.getenv('JAVIS_STUB_DELAY', '0.05'))
+        self.token_delay = token_delay
+
+    def start_chat(self, history=None):
+        return StubChat(history, self.token_delay)
@@ -5,6 +5,8 @@ function App() {
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  // Identifies this conversation to the backend, which keeps one chat per session
+  const [sessionId] = useState(() => crypto.randomUUID());
 
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -16,21 +18,54 @@ function App() {
     setIsLoading(true);
 
     try {
-      const response = await fetch('http://localhost:5001/chat', {
+      const response = await fetch('http://localhost:5001/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ message: input }),
+        body: JSON.stringify({ message: input, session_id: sessionId }),
       });
 
-      const data = await response.json();
-      
-      // Add bot response to chat
-      setMessages(prev => [...prev, {
-        role: 'assistant',
-        content: data.response
-      }]);
+      if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.error);
+      }
+
+      // Add an empty bot response and fill it in as tokens stream in
+      setMessages(prev => [...prev, { role: 'assistant', content: '' }]);
+
+      const appendToReply = (text) => {
+        setMessages(prev => {
+          const last = prev[prev.length - 1];
+          return [...prev.slice(0, -1), { ...last, content: last.content + text }];
+        });
+      };
+
+      // Server-Sent Events are separated by a blank line
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const event of events) {
+          const lines = event.split('\n');
+          const type = lines.find(line => line.startsWith('event: '));
+          const data = lines.find(line => line.startsWith('data: '));
+          if (!type || !data) continue;
+
+          const payload = JSON.parse(data.slice('data: '.length));
+          if (type === 'event: token') {
+            appendToReply(payload.token);
+          } else if (type === 'event: error') {
+            throw new Error(payload.error);
+          }
+        }
+      }
     } catch (error) {
       console.error('Error:', error);
     } finally {
@@ -53,7 +88,7 @@ function App() {
             </div>
           </div>
         ))}
-        {isLoading && (
+        {isLoading && messages[messages.length - 1]?.role !== 'assistant' && (
           <div className="message assistant">
             <div className="message-content">
               Thinking...
@@ -0,0 +1,112 @@
+import sqlite3
+from collections import deque
+
+
+class MemoryFrontier:
+    """In-memory FIFO of (url, depth) items waiting to be crawled"""
+    def __init__(self):
+        self.queue = deque()
+
+    def push(self, url, depth):
+        self.queue.append((url, depth))
+
+    def pop(self):
+        """Return the next (key, url, depth) item, or None if the frontier is empty"""
+        if not self.queue:
+            return None
+        url, depth = self.queue.popleft()
+        return None, url, depth
+
+    def done(self, key):
+        """Mark a popped item as finished (nothing to do in memory)"""
+        pass
+
+    def __len__(self):
+        return len(self.queue)
+
+
+class SqliteSet:
+    """Set of URLs stored in a SQLite table instead of in memory"""
+    def __init__(self, conn, table):
+        self.conn = conn
+        self.table = table
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (url TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    def add(self, url):
+        self.conn.execute(f'INSERT OR IGNORE INTO {self.table} (url) VALUES (?)', (url,))
+
+    def update(self, urls):
+        self.conn.executemany(f'INSERT OR IGNORE INTO {self.table} (url) VALUES (?)',
+                              ((url,) for url in urls))
+
+    def __contains__(self, url):
+        row = self.conn.execute(f'SELECT 1 FROM {self.table} WHERE url = ?', (url,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self.conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+    def __iter__(self):
+        # Stream rows from the cursor rather than loading the whole table
+        for (url,) in self.conn.execute(f'SELECT url FROM {self.table}'):
+            yield url
+
+
+class CrawlStore:
+    """On-disk frontier and seen-sets so a crawl can resume after a crash
+
+    Every page is checkpointed in one transaction: the links and images it
+    found, the new URLs it queued, and the removal of the page itself from
+    the frontier. A page that was being fetched when the process died is
+    still in the frontier and gets fetched again on resume.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS frontier (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            depth INTEGER NOT NULL
+        )
+        ''')
+        self.visited_urls = SqliteSet(self.conn, 'visited_urls')
+        self.links = SqliteSet(self.conn, 'links')
+        self.images = SqliteSet(self.conn, 'images')
+        self.conn.commit()
+
+        # Items handed out by pop() but not finished yet stay in the table;
+        # the cursor just stops them being handed out twice in this run
+        self._cursor = 0
+
+    def push(self, url, depth):
+        self.conn.execute('INSERT INTO frontier (url, depth) VALUES (?, ?)', (url, depth))
+
+    def pop(self):
+        """Return the next (key, url, depth) item, or None if the frontier is empty"""
+        row = self.conn.execute('''
+        SELECT id, url, depth FROM frontier
+        WHERE id > ? ORDER BY id LIMIT 1
+        ''', (self._cursor,)).fetchone()
+        if row is None:
+            return None
+        self._cursor = row[0]
+        return row
+
+    def done(self, key):
+        """Remove a finished item from the frontier and checkpoint everything"""
+        self.conn.execute('DELETE FROM frontier WHERE id = ?', (key,))
+        self.conn.commit()
+
+    def is_new(self):
+        """True if nothing has been crawled or queued in this store yet"""
+        return len(self.visited_urls) == 0
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM frontier WHERE id > ?', (self._cursor,)).fetchone()[0]
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
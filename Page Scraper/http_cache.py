@@ -0,0 +1,125 @@
+import sqlite3
+import json
+import time
+from url_utils import canonicalize_url
+
+
+def cache_key(url):
+    """Normalize a URL for use as a cache key"""
+    return canonicalize_url(url)
+
+
+class ResponseCache:
+    """Local conditional-GET cache of pages and the links/images found on them
+
+    Only responses with an ETag or Last-Modified header are stored, since
+    those are the only ones a server can answer with 304 Not Modified.
+    Entries are evicted least-recently-used first once the cache grows past
+    max_bytes.
+    """
+    def __init__(self, path, max_bytes=100 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            links TEXT NOT NULL,
+            images TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+        self.conn.commit()
+        self.total_size = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def conditional_headers(self, url):
+        """Return If-None-Match/If-Modified-Since headers for a cached URL"""
+        row = self.conn.execute('SELECT etag, last_modified FROM responses WHERE url = ?',
+                                (cache_key(url),)).fetchone()
+        headers = {}
+        if row:
+            etag, last_modified = row
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def get(self, url):
+        """Return the cached (links, images) for a URL after a 304, or None"""
+        key = cache_key(url)
+        row = self.conn.execute('SELECT links, images FROM responses WHERE url = ?', (key,)).fetchone()
+        if row is None:
+            # The entry was evicted between the request and the 304
+            return None
+
+        self.conn.execute('UPDATE responses SET last_used = ? WHERE url = ?', (time.time(), key))
+        self.conn.commit()
+        self.hits += 1
+        return set(json.loads(row[0])), set(json.loads(row[1]))
+
+    def put(self, url, headers, links, images):
+        """Store a freshly fetched page if the server gave us validators"""
+        self.misses += 1
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+
+        key = cache_key(url)
+        links_json = json.dumps(sorted(links))
+        images_json = json.dumps(sorted(images))
+        size = len(key) + len(links_json) + len(images_json) + len(etag or '') + len(last_modified or '')
+        if size > self.max_bytes:
+            return
+
+        old = self.conn.execute('SELECT size FROM responses WHERE url = ?', (key,)).fetchone()
+        if old:
+            self.total_size -= old[0]
+        self.conn.execute('''
+        INSERT OR REPLACE INTO responses (url, etag, last_modified, links, images, size, last_used)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (key, etag, last_modified, links_json, images_json, size, time.time()))
+        self.total_size += size
+        self._evict()
+        self.conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        if self.total_size <= self.max_bytes:
+            return
+
+        victims = []
+        for url, size in self.conn.execute('SELECT url, size FROM responses ORDER BY last_used'):
+            victims.append((url,))
+            self.total_size -= size
+            if self.total_size <= self.max_bytes:
+                break
+        self.conn.executemany('DELETE FROM responses WHERE url = ?', victims)
+        self.evictions += len(victims)
+
+    def stats(self):
+        entries = self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'size_bytes': self.total_size
+        }
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
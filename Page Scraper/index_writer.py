@@ -0,0 +1,84 @@
+import gzip
+import json
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class IndexWriter:
+    """Streams the crawl index as NDJSON, one record per scraped page
+
+    Compression is picked from the file extension: '.gz' for gzip and '.zst'
+    for zstd. The output is flushed at least once a second so other tools
+    can read the index while the crawl is still running, and close() appends
+    a summary record as the last line.
+
+    With append=True (used when resuming a crawl) records are added after
+    the existing ones: gzip starts a new member and zstd a new frame, and
+    both formats decompress concatenated members as one stream. The index
+    then holds one summary record per run.
+    """
+    def __init__(self, filename, flush_interval=1.0, append=False):
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.pages = 0
+        self._last_flush = time.monotonic()
+        self._raw = None
+        mode = 'a' if append else 'w'
+
+        if filename.endswith('.gz'):
+            self.file = gzip.open(filename, mode + 't', encoding='utf-8')
+        elif filename.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError("zstd output requires zstandard (pip install zstandard)")
+            self._raw = open(filename, mode + 'b')
+            writer = zstandard.ZstdCompressor().stream_writer(self._raw)
+            self.file = _TextWriter(writer)
+        else:
+            self.file = open(filename, mode, encoding='utf-8')
+
+    def write_page(self, url, depth, status, links, images, fetch_time):
+        self._write({
+            'type': 'page',
+            'url': url,
+            'depth': depth,
+            'status': status,
+            'fetch_time': round(fetch_time, 4),
+            'links': sorted(links),
+            'images': sorted(images)
+        })
+        self.pages += 1
+
+    def close(self, summary):
+        """Write the summary footer and close the file"""
+        self._write(dict(summary, type='summary'))
+        self.file.close()
+        if self._raw is not None:
+            self._raw.close()
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            # For compressed output this ends the current block, so readers
+            # can decompress everything written so far
+            self.file.flush()
+            self._last_flush = now
+
+
+class _TextWriter:
+    """Minimal text wrapper around a zstandard stream writer"""
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, text):
+        self.writer.write(text.encode('utf-8'))
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
@@ -1,21 +1,191 @@
 import requests
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 from urllib.parse import urljoin, urlparse
+import codecs
 import json
 from datetime import datetime
 import time
-from collections import deque
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from crawl_store import CrawlStore, MemoryFrontier
+from http_cache import ResponseCache
+from url_utils import BloomFilter, canonicalize_url, DEFAULT_TRACKING_PARAMS
+from index_writer import IndexWriter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class LinkExtractor(HTMLParser):
+    """Incremental tag scanner that only collects a[href] and img[src]
+
+    Uses the same tokenizer as BeautifulSoup's 'html.parser' backend but never
+    builds a tree, so HTML can be fed in chunks as it arrives.
+    """
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=False)
+        self.base_url = base_url
+        self.links = set()
+        self.images = set()
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            absolute_url = self._resolve(href) if href else None
+            # Skip fragment identifiers and javascript links
+            if absolute_url and absolute_url.startswith(('http://', 'https://')):
+                self.links.add(absolute_url)
+        elif tag == 'img':
+            src = dict(attrs).get('src')
+            absolute_url = self._resolve(src) if src else None
+            if absolute_url:
+                self.images.add(absolute_url)
+
+    def _resolve(self, reference):
+        # urljoin raises ValueError on malformed references found in real
+        # pages, e.g. 'http://[::1/x' (Invalid IPv6 URL); skip those
+        try:
+            return urljoin(self.base_url, reference)
+        except ValueError:
+            return None
+
+
+def parse_html(url, body, encoding=None):
+    """Decode a raw page body and return its links and images
+
+    Lives at module level so it can be sent to parse worker processes.
+    """
+    try:
+        text = body.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        # Unknown charset in the Content-Type header
+        text = body.decode('utf-8', errors='replace')
+
+    extractor = LinkExtractor(url)
+    extractor.feed(text)
+    extractor.close()
+    return extractor.links, extractor.images
+
+
+def incremental_decoder(encoding):
+    """Incremental decoder for a page's charset, falling back to UTF-8 like parse_html"""
+    try:
+        decoder_class = codecs.getincrementaldecoder(encoding or 'utf-8')
+    except LookupError:
+        # Unknown charset in the Content-Type header
+        decoder_class = codecs.getincrementaldecoder('utf-8')
+    return decoder_class(errors='replace')
+
+
+class StageStats:
+    """Counts pages, bytes and busy time for one stage of the crawl pipeline"""
+    def __init__(self, name):
+        self.name = name
+        self.pages = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def record(self, nbytes, seconds):
+        self.pages += 1
+        self.bytes += nbytes
+        self.seconds += seconds
+
+    def summary(self, wall_time):
+        """Describe throughput over the whole run and average time per page"""
+        rate = self.pages / wall_time if wall_time else 0.0
+        mb_rate = self.bytes / wall_time / 1e6 if wall_time else 0.0
+        avg_ms = self.seconds / self.pages * 1000 if self.pages else 0.0
+        return (f"{self.name}: {self.pages} pages, {self.bytes / 1e6:.1f} MB, "
+                f"{rate:.1f} pages/s, {mb_rate:.2f} MB/s, {avg_ms:.1f} ms/page")
+
+
+class HostThrottle:
+    """Per-host concurrency cap and minimum delay between requests"""
+    def __init__(self, max_per_host=4, delay=0.5):
+        self.max_per_host = max_per_host
+        self.delay = delay
+        self._semaphores = {}
+        self._next_slot = {}
+
+    @asynccontextmanager
+    async def slot(self, url):
+        """Wait for a free connection slot and the politeness delay for url's host"""
+        host = urlparse(url).netloc
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.max_per_host))
+        async with semaphore:
+            # Reserve the next start time for this host before sleeping, so
+            # requests to the same host are spaced out by at least self.delay
+            now = asyncio.get_running_loop().time()
+            start = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = start + self.delay
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
 
 class PageScraper:
-    def __init__(self, base_url, max_depth=1, restrict_domain=True, delay=0.5):
+    def __init__(self, base_url, max_depth=1, restrict_domain=True, delay=0.5, state_file=None,
+                 cache_file=None, cache_max_bytes=100 * 1024 * 1024, normalize_urls=True,
+                 tracking_params=DEFAULT_TRACKING_PARAMS, bloom_capacity=None, bloom_error_rate=0.001,
+                 index_file=None):
+        self.normalize_urls = normalize_urls
+        self.tracking_params = tracking_params
         self.base_url = base_url
         self.max_depth = max_depth
         self.restrict_domain = restrict_domain
         self.delay = delay
-        self.links = set()
-        self.images = set()
-        self.visited_urls = set()
-        self.base_domain = urlparse(base_url).netloc
+        self.base_domain = urlparse(self.normalize_url(base_url)).netloc
+
+        if state_file and bloom_capacity:
+            raise ValueError("A Bloom filter seen-set can't be combined with a resumable state file")
+
+        # Conditional-GET cache so re-crawls only download pages that changed
+        self.cache = ResponseCache(cache_file, cache_max_bytes) if cache_file else None
+
+        # Pipeline state for scrape_async
+        self._parse_pool = None
+        self.fetch_stats = StageStats("Fetch")
+        self.parse_stats = StageStats("Parse")
+
+        if state_file:
+            # Keep the frontier and seen-sets on disk so memory stays bounded
+            # and the crawl can resume where it stopped
+            self.store = CrawlStore(state_file)
+            self.frontier = self.store
+            self.links = self.store.links
+            self.images = self.store.images
+            self.visited_urls = self.store.visited_urls
+        else:
+            self.store = None
+            self.frontier = MemoryFrontier()
+            self.links = set()
+            self.images = set()
+            if bloom_capacity:
+                # Compact probabilistic seen-set for very large crawls
+                self.visited_urls = BloomFilter(bloom_capacity, bloom_error_rate)
+            else:
+                self.visited_urls = set()
+
+        # Stream one NDJSON record per page as the crawl runs. A resumed
+        # crawl appends to the index instead of truncating what's there.
+        resuming = self.store is not None and not self.store.is_new()
+        self.index_writer = IndexWriter(index_file, append=resuming) if index_file else None
+
+    def normalize_url(self, url):
+        """Canonicalize a URL so trivial variants are only crawled once
+
+        The canonical form is only a dedup key for the seen-sets: pages are
+        still fetched at the URL they were discovered as.
+        """
+        if not self.normalize_urls:
+            return url
+        return canonicalize_url(url, self.tracking_params)
 
     def is_same_domain(self, url):
         """Check if URL belongs to the same domain as base_url"""
@@ -27,77 +197,240 @@ class PageScraper:
         if self.restrict_domain:
             print(f"Restricting to domain: {self.base_domain}")
 
-        # Initialize queue with (url, depth) tuples
-        queue = deque([(self.base_url, 0)])
-        self.visited_urls.add(self.base_url)
+        self._seed_frontier()
 
-        while queue:
-            current_url, depth = queue.popleft()
+        while True:
+            item = self.frontier.pop()
+            if item is None:
+                break
+            key, current_url, depth = item
             print(f"Scraping {current_url} (depth {depth}/{self.max_depth})")
 
             # Scrape the current page
-            page_links, page_images = self._scrape_page(current_url)
+            fetch_start = time.perf_counter()
+            page_links, page_images, status = self._scrape_page(current_url)
+            fetch_time = time.perf_counter() - fetch_start
 
-            # Add discovered links and images to our collections
-            self.links.update(page_links)
-            self.images.update(page_images)
+            # Record results, queue up any new links and checkpoint the page
+            new_items = self._process_page(current_url, depth, status, fetch_time, page_links, page_images)
+            for link, next_depth in new_items:
+                self.frontier.push(link, next_depth)
+            self.frontier.done(key)
 
-            # If we haven't reached max depth, add new links to the queue
-            if depth < self.max_depth:
-                for link in page_links:
-                    # Skip if we've already visited this URL
-                    if link in self.visited_urls:
-                        continue
+            # Be polite and wait between requests
+            time.sleep(self.delay)
 
-                    # Skip if domain restriction is enabled and link is from a different domain
-                    if self.restrict_domain and not self.is_same_domain(link):
-                        continue
+    def scrape_async(self, concurrency=20, max_per_host=4, parse_workers=0):
+        """Start the scraping process with many fetches in flight at once
 
-                    # Add to queue and mark as visited
-                    queue.append((link, depth + 1))
-                    self.visited_urls.add(link)
+        With parse_workers > 0, fetching and parsing become separate stages:
+        the event loop only downloads raw bytes and hands them to a pool of
+        parse processes, so HTML parsing can use every core.
+        """
+        if aiohttp is None:
+            raise RuntimeError("Async scraping requires aiohttp (pip install aiohttp)")
 
-            # Be polite and wait between requests
-            time.sleep(self.delay)
+        print(f"Starting async scrape from {self.base_url} with max depth {self.max_depth}")
+        print(f"Concurrency: {concurrency} total, {max_per_host} per host, {self.delay}s delay per host")
+        if parse_workers:
+            print(f"Parsing in {parse_workers} worker processes")
+        if self.restrict_domain:
+            print(f"Restricting to domain: {self.base_domain}")
+
+        self.fetch_stats = StageStats("Fetch")
+        self.parse_stats = StageStats("Parse")
+        self._parse_pool = ProcessPoolExecutor(parse_workers) if parse_workers else None
+        start_time = time.perf_counter()
+        try:
+            asyncio.run(self._crawl(concurrency, max_per_host))
+        finally:
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown()
+                self._parse_pool = None
+
+        wall_time = time.perf_counter() - start_time
+        print(f"\n--- Stage Throughput ({wall_time:.1f}s) ---")
+        print(self.fetch_stats.summary(wall_time))
+        print(self.parse_stats.summary(wall_time))
+
+    def _seed_frontier(self):
+        """Queue the base URL, unless we're resuming a saved crawl"""
+        if self.store is not None and not self.store.is_new():
+            print(f"Resuming crawl with {len(self.frontier)} pages left in the frontier")
+            return
+
+        self.frontier.push(self.base_url, 0)
+        self.visited_urls.add(self.normalize_url(self.base_url))
+
+    async def _crawl(self, concurrency, max_per_host):
+        """Run a pool of crawl workers over a shared connection pool"""
+        self._seed_frontier()
+
+        # Workers wait on this when the frontier is empty but other pages are
+        # still in flight and may add more links
+        self._frontier_changed = asyncio.Condition()
+        self._in_flight = 0
+
+        throttle = HostThrottle(max_per_host, self.delay)
+        connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=max_per_host)
+        timeout = aiohttp.ClientTimeout(total=10)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            await asyncio.gather(*[
+                self._crawl_worker(session, throttle)
+                for _ in range(concurrency)
+            ])
+
+    async def _crawl_worker(self, session, throttle):
+        """Take pages off the frontier and scrape them until the crawl is finished"""
+        while True:
+            async with self._frontier_changed:
+                while (item := self.frontier.pop()) is None:
+                    # Nothing queued and nothing in flight means we're done
+                    if self._in_flight == 0:
+                        self._frontier_changed.notify_all()
+                        return
+                    await self._frontier_changed.wait()
+                self._in_flight += 1
 
-    def _scrape_page(self, url):
-        """Scrape a single page and return discovered links and images"""
-        page_links = set()
-        page_images = set()
+            key, current_url, depth = item
+            try:
+                print(f"Scraping {current_url} (depth {depth}/{self.max_depth})")
+                async with throttle.slot(current_url):
+                    fetch_start = time.perf_counter()
+                    page_links, page_images, status = await self._scrape_page_async(session, current_url)
+                    fetch_time = time.perf_counter() - fetch_start
 
+                # Record results, queue up any new links and checkpoint the page
+                new_items = self._process_page(current_url, depth, status, fetch_time, page_links, page_images)
+                for link, next_depth in new_items:
+                    self.frontier.push(link, next_depth)
+                self.frontier.done(key)
+            finally:
+                async with self._frontier_changed:
+                    self._in_flight -= 1
+                    self._frontier_changed.notify_all()
+
+    def _process_page(self, url, depth, status, fetch_time, page_links, page_images):
+        """Record a scraped page's results and return new (url, depth) items to crawl"""
+        # Canonical form of each discovered link, used for dedup and reporting
+        link_keys = {link: self.normalize_url(link) for link in page_links}
+        image_keys = {self.normalize_url(image) for image in page_images}
+
+        if self.index_writer:
+            self.index_writer.write_page(url, depth, status, set(link_keys.values()), image_keys, fetch_time)
+
+        # Add discovered links and images to our collections
+        self.links.update(link_keys.values())
+        self.images.update(image_keys)
+
+        # If we've reached max depth, don't follow any more links
+        if depth >= self.max_depth:
+            return []
+
+        new_items = []
+        for link, key in link_keys.items():
+            # Skip if we've already visited this URL
+            if key in self.visited_urls:
+                continue
+
+            # Skip if domain restriction is enabled and link is from a different domain
+            if self.restrict_domain and not self.is_same_domain(key):
+                continue
+
+            # Add to queue as discovered and mark its canonical form as visited
+            new_items.append((link, depth + 1))
+            self.visited_urls.add(key)
+
+        return new_items
+
+    def _scrape_page(self, url, use_cache=True):
+        """Scrape a single page and return discovered links, images and the HTTP status"""
         try:
-            # Fetch the webpage
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-
-            # Parse the HTML content
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Extract and process all links
-            for link in soup.find_all('a'):
-                href = link.get('href')
-                if href:
-                    absolute_url = urljoin(url, href)
-                    # Skip fragment identifiers and javascript links
-                    if absolute_url.startswith(('http://', 'https://')):
-                        page_links.add(absolute_url)
-
-            # Extract and process all images
-            for img in soup.find_all('img'):
-                src = img.get('src')
-                if src:
-                    absolute_url = urljoin(url, src)
-                    page_images.add(absolute_url)
-
-            return page_links, page_images
+            # Fetch the webpage and scan it chunk by chunk as it downloads
+            headers = self.cache.conditional_headers(url) if self.cache and use_cache else {}
+            with requests.get(url, timeout=10, stream=True, headers=headers) as response:
+                if response.status_code == 304 and self.cache:
+                    cached = self.cache.get(url)
+                    if cached is not None:
+                        return (*cached, 304)
+                    # Cache entry was evicted, so fetch the page again without validators
+                    return self._scrape_page(url, use_cache=False)
+                response.raise_for_status()
+                # Resolve relative links against where we ended up after redirects
+                extractor = LinkExtractor(response.url)
+                decoder = incremental_decoder(response.encoding)
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    extractor.feed(decoder.decode(chunk))
+                extractor.feed(decoder.decode(b'', final=True))
+                extractor.close()
+                if self.cache:
+                    self.cache.put(url, response.headers, extractor.links, extractor.images)
+            return extractor.links, extractor.images, response.status_code
 
         except requests.RequestException as e:
             print(f"Error scraping {url}: {e}")
-            return set(), set()
+            status = e.response.status_code if e.response is not None else None
+            return set(), set(), status
 
-    def save_index(self, filename='index.json'):
-        # Create index with metadata
-        index = {
+    async def _scrape_page_async(self, session, url, use_cache=True):
+        """Async version of _scrape_page using a shared aiohttp session"""
+        try:
+            headers = self.cache.conditional_headers(url) if self.cache and use_cache else {}
+            fetch_start = time.perf_counter()
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and self.cache:
+                    cached = self.cache.get(url)
+                    if cached is not None:
+                        return (*cached, 304)
+                    # Cache entry was evicted, so fetch the page again without validators
+                    return await self._scrape_page_async(session, url, use_cache=False)
+                response.raise_for_status()
+                response_headers = response.headers
+                status = response.status
+                # Resolve relative links against where we ended up after redirects
+                final_url = str(response.url)
+
+                if self._parse_pool is None:
+                    # Scan the body chunk by chunk as it downloads
+                    extractor = LinkExtractor(final_url)
+                    decoder = incremental_decoder(response.charset)
+                    size = 0
+                    parse_time = 0.0
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        size += len(chunk)
+                        parse_start = time.perf_counter()
+                        extractor.feed(decoder.decode(chunk))
+                        parse_time += time.perf_counter() - parse_start
+                    extractor.feed(decoder.decode(b'', final=True))
+                    extractor.close()
+                    self.fetch_stats.record(size, time.perf_counter() - fetch_start - parse_time)
+                    self.parse_stats.record(size, parse_time)
+                    page_links, page_images = extractor.links, extractor.images
+                else:
+                    body = await response.read()
+                    encoding = response.charset
+                    self.fetch_stats.record(len(body), time.perf_counter() - fetch_start)
+
+            if self._parse_pool is not None:
+                # Hand the raw bytes to a parse worker once the connection is released
+                parse_start = time.perf_counter()
+                loop = asyncio.get_running_loop()
+                page_links, page_images = await loop.run_in_executor(
+                    self._parse_pool, parse_html, final_url, body, encoding)
+                self.parse_stats.record(len(body), time.perf_counter() - parse_start)
+
+            if self.cache:
+                self.cache.put(url, response_headers, page_links, page_images)
+            return page_links, page_images, status
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Error scraping {url}: {e}")
+            return set(), set(), getattr(e, 'status', None)
+
+    def _index_metadata(self):
+        """Crawl metadata and stats shared by save_index and the streaming footer"""
+        return {
             'timestamp': datetime.now().isoformat(),
             'base_url': self.base_url,
             'config': {
@@ -108,9 +441,17 @@ class PageScraper:
             'stats': {
                 'total_links': len(self.links),
                 'total_images': len(self.images),
-                'pages_visited': len(self.visited_urls)
-            },
-            'visited_urls': list(self.visited_urls),
+                'pages_visited': len(self.visited_urls),
+                'cache': self.cache.stats() if self.cache else None
+            }
+        }
+
+    def save_index(self, filename='index.json'):
+        # Create index with metadata
+        index = {
+            **self._index_metadata(),
+            # A Bloom filter can only answer membership tests, not list its contents
+            'visited_urls': None if isinstance(self.visited_urls, BloomFilter) else list(self.visited_urls),
             'links': list(self.links),
             'images': list(self.images)
         }
@@ -121,6 +462,17 @@ class PageScraper:
 
         print(f"Results saved to {filename}")
 
+    def close(self):
+        """Finish the streamed index and close the on-disk crawl state and cache, if any"""
+        if self.index_writer is not None:
+            self.index_writer.close(self._index_metadata())
+            print(f"Index streamed to {self.index_writer.filename}")
+            self.index_writer = None
+        if self.store is not None:
+            self.store.close()
+        if self.cache is not None:
+            self.cache.close()
+
 def main():
     # Get user input
     url = input("Enter the website URL to scrape: ")
@@ -140,24 +492,65 @@ def main():
     except ValueError:
         delay = 0.5
 
+    # Get async crawl preference
+    async_input = input("Use async crawl with concurrent requests? (y/n, default: n): ").strip().lower()
+    use_async = async_input == 'y'
+    concurrency = 20
+    parse_workers = 0
+    if use_async:
+        concurrency_input = input("Maximum concurrent requests (default: 20): ").strip()
+        concurrency = int(concurrency_input) if concurrency_input.isdigit() else 20
+        workers_input = input("Parse worker processes (default: 0, parse in the fetch loop): ").strip()
+        parse_workers = int(workers_input) if workers_input.isdigit() else 0
+
+    # Get state file for a resumable crawl
+    state_file = input("State file for a resumable crawl (blank to keep everything in memory): ").strip()
+
+    # Get cache file for incremental re-crawls
+    cache_file = input("HTTP cache file for incremental re-crawls (blank to disable): ").strip()
+
+    # Get streaming index output
+    index_file = input("Stream index as NDJSON while crawling (.ndjson, .gz or .zst; blank to save JSON at the end): ").strip()
+
+    # Get extra tracking parameters to strip when normalizing URLs
+    params_input = input("Extra query params to strip, comma separated (default: utm_* and click IDs): ").strip()
+    tracking_params = DEFAULT_TRACKING_PARAMS + tuple(p.strip() for p in params_input.split(',') if p.strip())
+
+    # Get Bloom filter size for very large in-memory crawls
+    bloom_capacity = None
+    if not state_file:
+        bloom_input = input("Expected URL count for a compact Bloom filter seen-set (blank for exact set): ").strip()
+        bloom_capacity = int(bloom_input) if bloom_input.isdigit() else None
+
     # Create and configure the scraper
-    scraper = PageScraper(url, max_depth=max_depth, restrict_domain=restrict_domain, delay=delay)
+    scraper = PageScraper(url, max_depth=max_depth, restrict_domain=restrict_domain, delay=delay,
+                          state_file=state_file or None, cache_file=cache_file or None,
+                          tracking_params=tracking_params, bloom_capacity=bloom_capacity,
+                          index_file=index_file or None)
 
     # Start scraping
     print(f"\nStarting scraper...")
-    scraper.scrape()
+    if use_async:
+        scraper.scrape_async(concurrency=concurrency, parse_workers=parse_workers)
+    else:
+        scraper.scrape()
 
     # Print summary
     print("\n--- Scraping Complete ---")
     print(f"Pages visited: {len(scraper.visited_urls)}")
     print(f"Unique links found: {len(scraper.links)}")
     print(f"Unique images found: {len(scraper.images)}")
+    if scraper.cache:
+        stats = scraper.cache.stats()
+        print(f"Cache hits: {stats['hits']}, misses: {stats['misses']}")
 
     # Save results
-    filename = input("Enter filename to save results (default: index.json): ").strip()
-    if not filename:
-        filename = "index.json"
-    scraper.save_index(filename)
+    if not index_file:
+        filename = input("Enter filename to save results (default: index.json): ").strip()
+        if not filename:
+            filename = "index.json"
+        scraper.save_index(filename)
+    scraper.close()
 
 if __name__ == "__main__":
     main()
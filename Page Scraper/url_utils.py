@@ -0,0 +1,104 @@
+import hashlib
+import math
+from fnmatch import fnmatch
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track where a click came from and never change the page
+DEFAULT_TRACKING_PARAMS = ('utm_*', 'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga', 'ref_src')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url, tracking_params=DEFAULT_TRACKING_PARAMS, strip_trailing_slash=False):
+    """Rewrite a URL into one canonical form so trivial variants dedup together
+
+    Lowercases the scheme and host, drops default ports, fragments and
+    tracking parameters (fnmatch patterns such as 'utm_*') and sorts the
+    remaining query parameters. With strip_trailing_slash it also removes a
+    trailing slash from non-root paths; that is off by default because
+    /a and /a/ resolve relative links differently.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+
+    try:
+        port = parts.port
+    except ValueError:
+        # Leave URLs with malformed ports alone rather than guess
+        return url
+
+    host = parts.hostname or ''
+    if ':' in host:
+        host = f'[{host}]'
+    if port is not None and DEFAULT_PORTS.get(scheme) != port:
+        host = f'{host}:{port}'
+    if parts.username is not None:
+        userinfo = parts.username
+        if parts.password is not None:
+            userinfo += f':{parts.password}'
+        host = f'{userinfo}@{host}'
+
+    path = parts.path or '/'
+    if strip_trailing_slash and len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+
+    params = [
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not any(fnmatch(name.lower(), pattern) for pattern in tracking_params)
+    ]
+    query = urlencode(sorted(params))
+
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+class BloomFilter:
+    """Compact probabilistic set of strings
+
+    Uses about 1.2 bytes per item at a 1% false-positive rate instead of a
+    full Python string per URL. Membership tests never give false negatives,
+    so a crawl may skip a small fraction of never-seen URLs but will never
+    fetch the same URL twice.
+    """
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+        # Optimal bit count and hash count for the requested capacity and error rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: derive every bit position from two 64-bit hashes
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        is_new = False
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                is_new = True
+        if is_new:
+            self.count += 1
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def __len__(self):
+        """Approximate number of distinct items added"""
+        return self.count
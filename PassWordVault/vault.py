@@ -1,58 +1,370 @@
 import sqlite3
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 import base64
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import os
+import csv
+import hmac
+import hashlib
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+# Rows encrypted and inserted per executemany call during bulk import
+IMPORT_BATCH_SIZE = 500
+
+# Bumped whenever setup_database needs to migrate an existing vault file
+SCHEMA_VERSION = 2
+
+# Service name prefixes longer than this are matched on their first
+# SEARCH_PREFIX_LEN characters and then checked against the real name
+SEARCH_PREFIX_LEN = 12
+
+# Adding an existing service/username pair replaces its password
+UPSERT_SQL = '''
+INSERT INTO passwords (service, username, encrypted_password)
+VALUES (?, ?, ?)
+ON CONFLICT (service, username) DO UPDATE SET encrypted_password = excluded.encrypted_password
+'''
+
+def derive_key(master_password):
+    # Generate encryption key from master password (slow on purpose, so do it once)
+    salt = b'salt_'  # In production, use a secure random salt
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=100000,
+    )
+    return base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
+
+# Fernet instance for bulk-import worker processes, set by _init_encrypt_worker
+_worker_fernet = None
+
+def _init_encrypt_worker(key):
+    global _worker_fernet
+    _worker_fernet = Fernet(key)
+
+def _encrypt_batch(passwords):
+    return [_worker_fernet.encrypt(password.encode()) for password in passwords]
+
+def _read_entries(source, fmt):
+    # Yield (service, username, password) tuples from a CSV or JSON Lines stream
+    if fmt == 'csv':
+        for row in csv.DictReader(source):
+            yield row['service'], row['username'], row['password']
+    elif fmt == 'jsonl':
+        for line in source:
+            if line.strip():
+                entry = json.loads(line)
+                yield entry['service'], entry['username'], entry['password']
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+def _format_from_path(path):
+    # Pick csv or jsonl from a file extension
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+def _search_terms(service):
+    # Prefix terms for search-as-you-type, plus padded trigrams for fuzzy matches
+    name = service.strip().lower()
+    terms = {'p:' + name[:n] for n in range(1, min(len(name), SEARCH_PREFIX_LEN) + 1)}
+    padded = f' {name} '
+    terms.update('t:' + padded[i:i + 3] for i in range(len(padded) - 2))
+    return terms
+
+def _connect(db_path):
+    # Connections may be handed between threads by the pool, and wait up to
+    # 30s for a writer instead of failing with "database is locked"
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    # Switching a file to WAL can fail with "database is locked" straight
+    # away, without waiting for the timeout, while another process is
+    # opening the same new file, so retry it for the same 30s
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            break
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) or time.monotonic() > deadline:
+                conn.close()
+                raise
+            time.sleep(0.05)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+class ConnectionPool:
+    # Fixed set of read connections shared between threads. With WAL enabled,
+    # readers never block each other or the writer.
+    def __init__(self, db_path, size=4):
+        self.connections = queue.Queue()
+        for _ in range(size):
+            self.connections.put(_connect(db_path))
+
+    @contextmanager
+    def connection(self):
+        conn = self.connections.get()
+        try:
+            yield conn
+        finally:
+            self.connections.put(conn)
+
+    def close(self):
+        while not self.connections.empty():
+            self.connections.get_nowait().close()
 
 class PasswordVault:
-    def __init__(self, master_password):
+    def __init__(self, master_password=None, key=None, db_path='password_vault.db', pool_size=4):
         # Initialize database and encryption
-        self.conn = sqlite3.connect('password_vault.db')
-        self.cursor = self.conn.cursor()
+        # Pass an already derived key to skip the KDF, e.g. from a vault agent
+        self.db_path = db_path
+        self.conn = _connect(db_path)
         self.setup_database()
-        self.setup_encryption(master_password)
+        # Writes go through self.conn under a lock, reads use the pool
+        self._write_lock = threading.RLock()
+        self._in_batch = False
+        self.pool = ConnectionPool(db_path, pool_size)
+        if key is not None:
+            self.key = bytes(key)
+            self.fernet = Fernet(self.key)
+        else:
+            self.setup_encryption(master_password)
+        self.verify_key()
+        self.setup_search_index()
 
     def setup_database(self):
-        # Create passwords table if it doesn't exist
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS passwords (
+        # Create the tables, or migrate an older vault file to the current schema
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            return
+
+        # Another process may be migrating the same file at this moment, so
+        # take the write lock first and read the version again under it:
+        # whoever gets the lock second finds the steps already done.
+        duplicates = 0
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+            if version < 1:
+                duplicates = self._migrate_v1()
+            if version < 2:
+                self._migrate_v2()
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+        if duplicates:
+            print(f"Upgraded vault: moved {duplicates} older duplicate entries to the "
+                  f"passwords_duplicates table, keeping the newest password for each")
+
+    def _execute_in_transaction(self, script):
+        # executescript would commit the open transaction first, so run the
+        # statements one by one (the scripts have no ';' inside literals)
+        for statement in script.split(';'):
+            if statement.strip():
+                self.conn.execute(statement)
+
+    def _migrate_v1(self):
+        # Ciphertext as BLOB and a unique (service, username) index. Runs inside
+        # setup_database's transaction; returns the number of duplicates set aside.
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'passwords'").fetchone()
+        script = '''
+        CREATE TABLE passwords_v1 (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             service TEXT NOT NULL,
             username TEXT NOT NULL,
-            encrypted_password TEXT NOT NULL
-        )
+            encrypted_password BLOB NOT NULL
+        );
+        '''
+        duplicates = 0
+        if exists:
+            duplicates = self.conn.execute('''
+            SELECT COUNT(*) FROM passwords
+            WHERE id NOT IN (SELECT MAX(id) FROM passwords GROUP BY service, username)
+            ''').fetchone()[0]
+        if duplicates:
+            # Older vaults allowed duplicates, since add_password always inserted.
+            # The newest row for each pair is the most recently saved password,
+            # so it stays; the older ones are set aside instead of deleted.
+            script += '''
+            CREATE TABLE passwords_duplicates (
+                id INTEGER PRIMARY KEY,
+                service TEXT NOT NULL,
+                username TEXT NOT NULL,
+                encrypted_password BLOB NOT NULL
+            );
+            INSERT INTO passwords_duplicates (id, service, username, encrypted_password)
+            SELECT id, service, username, CAST(encrypted_password AS BLOB) FROM passwords
+            WHERE id NOT IN (SELECT MAX(id) FROM passwords GROUP BY service, username);
+            '''
+        if exists:
+            script += '''
+            INSERT INTO passwords_v1 (id, service, username, encrypted_password)
+            SELECT id, service, username, CAST(encrypted_password AS BLOB) FROM passwords
+            WHERE id IN (SELECT MAX(id) FROM passwords GROUP BY service, username);
+            DROP TABLE passwords;
+            '''
+        script += '''
+        ALTER TABLE passwords_v1 RENAME TO passwords;
+        CREATE UNIQUE INDEX passwords_service_username ON passwords (service, username);
+        PRAGMA user_version = 1;
+        '''
+        self._execute_in_transaction(script)
+        return duplicates
+
+    def _migrate_v2(self):
+        # Keyed search tokens for service names. The table holds only HMACs of
+        # name prefixes and trigrams, so it reveals nothing without the vault key.
+        # Runs inside setup_database's transaction.
+        self._execute_in_transaction('''
+        CREATE TABLE service_tokens (
+            token BLOB NOT NULL,
+            entry_id INTEGER NOT NULL REFERENCES passwords (id) ON DELETE CASCADE
+        );
+        CREATE INDEX service_tokens_token ON service_tokens (token);
+        CREATE INDEX service_tokens_entry ON service_tokens (entry_id);
+        CREATE TABLE search_meta (key_check BLOB NOT NULL);
+        PRAGMA user_version = 2;
         ''')
-        self.conn.commit()
+
+    def verify_key(self):
+        # Raise ValueError if the key can't decrypt what's already in the vault
+        row = self.conn.execute('SELECT encrypted_password FROM passwords LIMIT 1').fetchone()
+        if row is not None:
+            try:
+                self.fernet.decrypt(row[0])
+            except InvalidToken:
+                raise ValueError("Wrong master password") from None
+
+    def setup_search_index(self):
+        # Derive a separate key for search tokens, and build the token table if
+        # it doesn't exist yet. A key check that doesn't match means a wrong
+        # password (the key is verified first when the vault has entries), so
+        # the index is never rebuilt with the wrong key.
+        self.index_key = hmac.new(self.key, b'service-search-index', hashlib.sha256).digest()
+        key_check = self._token('key-check')
+        row = self.conn.execute('SELECT key_check FROM search_meta').fetchone()
+        if row is None:
+            self.rebuild_search_index(key_check)
+        elif row[0] != key_check:
+            raise ValueError("Wrong master password")
+
+    def rebuild_search_index(self, key_check=None):
+        with self.batch():
+            self.conn.execute('DELETE FROM service_tokens')
+            self.conn.execute('DELETE FROM search_meta')
+            self.conn.execute('INSERT INTO search_meta (key_check) VALUES (?)',
+                              (key_check or self._token('key-check'),))
+            rows = self.conn.execute('SELECT id, service FROM passwords').fetchall()
+            for entry_id, service in rows:
+                self._index_entry(entry_id, service)
+
+    def _token(self, term):
+        # Truncated keyed HMAC: small enough to index, long enough not to collide
+        return hmac.new(self.index_key, term.encode(), hashlib.sha256).digest()[:12]
+
+    def _index_entry(self, entry_id, service):
+        # Replace the search tokens for one entry (caller holds the write lock)
+        self.conn.execute('DELETE FROM service_tokens WHERE entry_id = ?', (entry_id,))
+        self.conn.executemany('INSERT INTO service_tokens (token, entry_id) VALUES (?, ?)',
+                              [(self._token(term), entry_id) for term in _search_terms(service)])
+
+    def _index_pairs(self, pairs):
+        # Index entries just written by service/username (caller holds the write lock)
+        for service, username in pairs:
+            row = self.conn.execute('SELECT id FROM passwords WHERE service = ? AND username = ?',
+                                    (service, username)).fetchone()
+            self._index_entry(row[0], service)
+
+    def search_services(self, query, limit=20, fuzzy=True):
+        # Find (service, username) pairs whose service starts with query, then
+        # fill up with fuzzy trigram matches ranked by how many trigrams they share
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        results = []
+        with self.pool.connection() as conn:
+            rows = conn.execute('''
+            SELECT p.service, p.username FROM service_tokens t
+            JOIN passwords p ON p.id = t.entry_id
+            WHERE t.token = ?
+            ORDER BY p.service, p.username
+            ''', (self._token('p:' + query[:SEARCH_PREFIX_LEN]),))
+            for service, username in rows:
+                if service.lower().startswith(query):
+                    results.append((service, username))
+                    if len(results) >= limit:
+                        return results
+
+            if fuzzy:
+                # Only pad the front: the user may still be typing the end
+                padded = f' {query}'
+                tokens = [self._token('t:' + padded[i:i + 3]) for i in range(len(padded) - 2)]
+                if tokens:
+                    min_hits = max(1, (len(tokens) + 1) // 2)
+                    rows = conn.execute(f'''
+                    SELECT p.service, p.username, COUNT(*) AS hits FROM service_tokens t
+                    JOIN passwords p ON p.id = t.entry_id
+                    WHERE t.token IN ({', '.join('?' * len(tokens))})
+                    GROUP BY t.entry_id
+                    HAVING hits >= ?
+                    ORDER BY hits DESC, p.service, p.username
+                    LIMIT ?
+                    ''', (*tokens, min_hits, limit + len(results)))
+                    seen = set(results)
+                    for service, username, _ in rows:
+                        if (service, username) not in seen:
+                            results.append((service, username))
+                            if len(results) >= limit:
+                                break
+        return results
 
     def setup_encryption(self, master_password):
-        # Generate encryption key from master password
-        salt = b'salt_'  # In production, use a secure random salt
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
-        self.fernet = Fernet(key)
+        self.key = derive_key(master_password)
+        self.fernet = Fernet(self.key)
+
+    def _commit(self):
+        # Commit now unless we're inside a batch() block
+        if not self._in_batch:
+            self.conn.commit()
+
+    @contextmanager
+    def batch(self):
+        # Group many add/delete calls into one transaction (and one fsync).
+        # Holds the write lock, so other threads' writes wait until it's done.
+        with self._write_lock:
+            self._in_batch = True
+            try:
+                yield self
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            finally:
+                self._in_batch = False
 
     def add_password(self, service, username, password):
-        # Encrypt and store password
+        # Encrypt and store password, replacing any existing one for this service/username
         encrypted_password = self.fernet.encrypt(password.encode())
-        self.cursor.execute('''
-        INSERT INTO passwords (service, username, encrypted_password)
-        VALUES (?, ?, ?)
-        ''', (service, username, encrypted_password))
-        self.conn.commit()
+        with self._write_lock:
+            self.conn.execute(UPSERT_SQL, (service, username, encrypted_password))
+            self._index_pairs([(service, username)])
+            self._commit()
 
     def get_password(self, service, username):
-        # Retrieve and decrypt password
-        self.cursor.execute('''
-        SELECT encrypted_password FROM passwords 
-        WHERE service = ? AND username = ?
-        ''', (service, username))
-        result = self.cursor.fetchone()
+        # Retrieve and decrypt password (uses the unique index, safe from any thread)
+        with self.pool.connection() as conn:
+            result = conn.execute('''
+            SELECT encrypted_password FROM passwords 
+            WHERE service = ? AND username = ?
+            ''', (service, username)).fetchone()
         if result:
             decrypted_password = self.fernet.decrypt(result[0])
             return decrypted_password.decode()
@@ -60,26 +372,124 @@ class PasswordVault:
 
     def list_services(self):
         # List all stored services and usernames
-        self.cursor.execute('SELECT service, username FROM passwords')
-        return self.cursor.fetchall()
+        with self.pool.connection() as conn:
+            return conn.execute('SELECT service, username FROM passwords').fetchall()
 
     def delete_password(self, service, username):
         # Delete a stored password
-        self.cursor.execute('''
-        DELETE FROM passwords 
-        WHERE service = ? AND username = ?
-        ''', (service, username))
-        self.conn.commit()
+        with self._write_lock:
+            self.conn.execute('''
+            DELETE FROM service_tokens WHERE entry_id IN (
+                SELECT id FROM passwords WHERE service = ? AND username = ?
+            )
+            ''', (service, username))
+            self.conn.execute('''
+            DELETE FROM passwords 
+            WHERE service = ? AND username = ?
+            ''', (service, username))
+            self._commit()
+
+    def import_entries(self, source, fmt=None, workers=None):
+        # Bulk import (service, username, password) rows from a CSV or JSON Lines
+        # file in a single transaction, encrypting batches in parallel processes.
+        # Returns the number of rows imported.
+        if isinstance(source, str):
+            with open(source, newline='', encoding='utf-8') as f:
+                return self.import_entries(f, fmt or _format_from_path(source), workers)
+
+        workers = workers or os.cpu_count() or 1
+        entries = _read_entries(source, fmt or 'csv')
+        count = 0
+
+        def insert(batch, encrypted):
+            self.conn.executemany(UPSERT_SQL, [
+                (service, username, token) for (service, username, _), token in zip(batch, encrypted)
+            ])
+            self._index_pairs((service, username) for service, username, _ in batch)
+
+        def batches():
+            batch = []
+            for entry in entries:
+                batch.append(entry)
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        with self.batch():
+            if workers == 1:
+                for batch in batches():
+                    insert(batch, [self.fernet.encrypt(password.encode()) for _, _, password in batch])
+                    count += len(batch)
+            else:
+                with ProcessPoolExecutor(workers, initializer=_init_encrypt_worker,
+                                         initargs=(self.key,)) as pool:
+                    # Keep only a few batches in flight so huge imports stream
+                    # through in bounded memory
+                    pending = deque()
+                    for batch in batches():
+                        passwords = [password for _, _, password in batch]
+                        pending.append((batch, pool.submit(_encrypt_batch, passwords)))
+                        if len(pending) >= workers * 2:
+                            done_batch, future = pending.popleft()
+                            insert(done_batch, future.result())
+                            count += len(done_batch)
+                    while pending:
+                        done_batch, future = pending.popleft()
+                        insert(done_batch, future.result())
+                        count += len(done_batch)
+        return count
+
+    def export_entries(self, dest, fmt=None):
+        # Stream every entry, decrypted, to a CSV or JSON Lines file.
+        # Returns the number of rows exported.
+        if isinstance(dest, str):
+            with open(dest, 'w', newline='', encoding='utf-8') as f:
+                return self.export_entries(f, fmt or _format_from_path(dest))
+
+        fmt = fmt or 'csv'
+        if fmt not in ('csv', 'jsonl'):
+            raise ValueError(f"Unknown format: {fmt}")
+        writer = csv.writer(dest) if fmt == 'csv' else None
+        if writer:
+            writer.writerow(['service', 'username', 'password'])
+
+        count = 0
+        with self.pool.connection() as conn:
+            # Iterate the cursor directly instead of fetchall() so rows stream out
+            rows = conn.execute('SELECT service, username, encrypted_password FROM passwords ORDER BY id')
+            for service, username, encrypted_password in rows:
+                password = self.fernet.decrypt(encrypted_password).decode()
+                if writer:
+                    writer.writerow([service, username, password])
+                else:
+                    dest.write(json.dumps({'service': service, 'username': username, 'password': password}) + '\n')
+                count += 1
+        return count
+
+    def close(self):
+        # Close database connections and drop the key material. Python bytes
+        # can't be overwritten, so this only releases the references.
+        # __init__ may have failed part way, so only close what was opened.
+        if getattr(self, 'pool', None) is not None:
+            self.pool.close()
+        if getattr(self, 'conn', None) is not None:
+            self.conn.close()
+        self.key = self.fernet = self.index_key = None
 
     def __del__(self):
-        # Close database connection
-        self.conn.close()
+        self.close()
 
 # Example usage
 def main():
     # Create vault with master password
     master_password = input("Enter master password: ")
-    vault = PasswordVault(master_password)
+    try:
+        vault = PasswordVault(master_password)
+    except ValueError as e:
+        print(e)
+        return
     
     while True:
         print("\n=== Password Vault Menu ===")
@@ -87,9 +497,12 @@ def main():
         print("2. Get password")
         print("3. List all services")
         print("4. Delete password")
-        print("5. Exit")
+        print("5. Import from file")
+        print("6. Export to file")
+        print("7. Search services")
+        print("8. Exit")
         
-        choice = input("\nEnter your choice (1-5): ")
+        choice = input("\nEnter your choice (1-8): ")
         
         if choice == "1":
             service = input("Enter service name: ")
@@ -123,6 +536,25 @@ def main():
             print("Password deleted successfully!")
             
         elif choice == "5":
+            path = input("Enter .csv or .jsonl file to import: ")
+            count = vault.import_entries(path)
+            print(f"Imported {count} passwords!")
+            
+        elif choice == "6":
+            path = input("Enter .csv or .jsonl file to export to: ")
+            count = vault.export_entries(path)
+            print(f"Exported {count} passwords to {path}")
+            
+        elif choice == "7":
+            query = input("Search for: ")
+            matches = vault.search_services(query)
+            if matches:
+                for service, username in matches:
+                    print(f"Service: {service}, Username: {username}")
+            else:
+                print("No matching services!")
+            
+        elif choice == "8":
             print("Goodbye!")
             break
             
@@ -0,0 +1,266 @@
+import getpass
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import time
+from vault import PasswordVault, derive_key
+
+DEFAULT_IDLE_TIMEOUT = 15 * 60  # Lock after 15 minutes without a request
+
+
+def default_socket_path():
+    # Keep the socket in a private per-user directory
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or os.path.join(os.path.expanduser('~'), '.password_vault')
+    return os.path.join(runtime_dir, 'vault_agent.sock')
+
+
+class KeyHolder:
+    """Holds the derived vault key in memory and forgets it after an idle timeout
+
+    Only this holder's own copy is zeroed on lock. The vault and its Fernet
+    instance keep immutable bytes copies, which can only be released (see
+    VaultAgent.lock), not overwritten.
+    """
+    def __init__(self, key, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        # A bytearray rather than bytes, so this copy can be overwritten on lock
+        self._key = bytearray(key)
+        self.idle_timeout = idle_timeout
+        self.last_used = time.monotonic()
+
+    @property
+    def locked(self):
+        return self._key is None
+
+    def key(self):
+        if self.locked:
+            raise RuntimeError("Vault is locked")
+        self.last_used = time.monotonic()
+        return self._key
+
+    def expired(self):
+        return time.monotonic() - self.last_used > self.idle_timeout
+
+    def lock(self):
+        if self._key is not None:
+            for i in range(len(self._key)):
+                self._key[i] = 0
+            self._key = None
+
+
+class VaultRequestHandler(socketserver.StreamRequestHandler):
+    """Serves one JSON request per connection: {"op": ..., ...} -> {"ok": ..., ...}"""
+    # Seconds a client gets to send its request and read the reply. Requests
+    # are served one at a time, so without this a client that connects and
+    # stays silent would block the agent, idle-timeout lock included.
+    timeout = 5
+
+    def handle(self):
+        if not self.server.peer_allowed(self.request):
+            self._reply({'ok': False, 'error': 'Permission denied'})
+            return
+
+        try:
+            line = self.rfile.readline()
+        except OSError:
+            # Timed out (socket.timeout is an OSError) or the client went away
+            return
+
+        try:
+            request = json.loads(line)
+            result = self.server.dispatch(request)
+            self._reply({'ok': True, 'result': result})
+        except Exception as e:
+            self._reply({'ok': False, 'error': str(e)})
+
+    def _reply(self, response):
+        try:
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+        except OSError:
+            # The client stopped reading or disconnected, nothing left to tell it
+            pass
+
+
+class VaultAgent(socketserver.UnixStreamServer):
+    """Keeps an unlocked vault open and serves lookups over a local Unix socket
+
+    The expensive PBKDF2 key derivation runs once when the agent starts, so
+    short-lived clients pay only for a socket round trip and a SQL query.
+    Requests are handled one at a time on a single thread, which is plenty
+    for sub-millisecond lookups and keeps the SQLite connection on one thread.
+    """
+    def __init__(self, key, socket_path=None, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.socket_path = socket_path or default_socket_path()
+        self.holder = KeyHolder(key, idle_timeout)
+        self.vault = None
+
+        # Private directory and socket so only this user can connect
+        os.makedirs(os.path.dirname(self.socket_path), mode=0o700, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(self.socket_path, VaultRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+        # Wake up at least once a second to check the idle timeout
+        self.timeout = 1
+
+    def peer_allowed(self, conn):
+        """Only accept connections from processes owned by the same user"""
+        if not hasattr(socket, 'SO_PEERCRED'):
+            # No peer credentials on this platform, rely on the socket's permissions
+            return True
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', creds)
+        return uid == os.getuid()
+
+    def dispatch(self, request):
+        op = request.get('op')
+        if op == 'ping':
+            # Liveness checks don't count as use, so they can't keep the vault unlocked
+            if self.holder.locked:
+                raise RuntimeError("Vault is locked")
+            return 'pong'
+        self.holder.key()  # Resets the idle timer, raises if locked
+
+        if op == 'get':
+            return self.vault.get_password(request['service'], request['username'])
+        if op == 'add':
+            self.vault.add_password(request['service'], request['username'], request['password'])
+            return None
+        if op == 'list':
+            return self.vault.list_services()
+        if op == 'search':
+            return self.vault.search_services(request['query'], request.get('limit', 20))
+        if op == 'delete':
+            self.vault.delete_password(request['service'], request['username'])
+            return None
+        if op == 'lock':
+            self.lock()
+            return None
+        raise ValueError(f"Unknown op: {op}")
+
+    def handle_timeout(self):
+        if not self.holder.locked and self.holder.expired():
+            print("Idle timeout reached, locking vault")
+            self.lock()
+
+    def lock(self):
+        """Wipe the held key and close the vault, releasing its copies of the key"""
+        self.holder.lock()
+        if self.vault is not None:
+            self.vault.close()
+            self.vault = None
+
+    def run(self):
+        try:
+            # Open the vault here so the SQLite connection lives on the serving
+            # thread. This also checks the key, raising ValueError if it's wrong.
+            self.vault = PasswordVault(key=self.holder.key())
+            print(f"Vault agent listening on {self.socket_path}")
+            while not self.holder.locked:
+                self.handle_request()
+                # handle_request only times out after a quiet second, so a
+                # steady stream of pings would otherwise postpone the check
+                self.handle_timeout()
+        finally:
+            self.lock()
+            self.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        print("Vault agent stopped")
+
+
+class VaultClient:
+    """Talks to a running VaultAgent with the same methods as PasswordVault"""
+    def __init__(self, socket_path=None, timeout=5):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+
+    def _call(self, op, **params):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(dict(params, op=op)).encode() + b'\n')
+            response = json.loads(sock.makefile('rb').readline())
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def is_running(self):
+        try:
+            return self._call('ping') == 'pong'
+        except (OSError, RuntimeError, ValueError):
+            return False
+
+    def add_password(self, service, username, password):
+        self._call('add', service=service, username=username, password=password)
+
+    def get_password(self, service, username):
+        return self._call('get', service=service, username=username)
+
+    def list_services(self):
+        return [tuple(row) for row in self._call('list')]
+
+    def search_services(self, query, limit=20):
+        return [tuple(row) for row in self._call('search', query=query, limit=limit)]
+
+    def delete_password(self, service, username):
+        self._call('delete', service=service, username=username)
+
+    def lock(self):
+        self._call('lock')
+
+
+def main():
+    usage = ("Usage: vault_agent.py start [idle_minutes] | get SERVICE USERNAME | "
+             "add SERVICE USERNAME | list | search QUERY | delete SERVICE USERNAME | lock")
+    args = sys.argv[1:]
+    if not args:
+        print(usage)
+        return
+
+    command = args[0]
+    if command == 'start':
+        idle_minutes = float(args[1]) if len(args) > 1 else DEFAULT_IDLE_TIMEOUT / 60
+        key = derive_key(getpass.getpass("Enter master password: "))
+        try:
+            VaultAgent(key, idle_timeout=idle_minutes * 60).run()
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        return
+
+    client = VaultClient()
+    if not client.is_running():
+        print("Vault agent is not running. Start it with: python vault_agent.py start")
+        sys.exit(1)
+
+    if command == 'get' and len(args) == 3:
+        password = client.get_password(args[1], args[2])
+        print(password if password is not None else "Password not found!")
+    elif command == 'add' and len(args) == 3:
+        client.add_password(args[1], args[2], getpass.getpass("Enter password: "))
+        print("Password added successfully!")
+    elif command == 'list':
+        for service, username in client.list_services():
+            print(f"Service: {service}, Username: {username}")
+    elif command == 'search' and len(args) == 2:
+        for service, username in client.search_services(args[1]):
+            print(f"Service: {service}, Username: {username}")
+    elif command == 'delete' and len(args) == 3:
+        client.delete_password(args[1], args[2])
+        print("Password deleted successfully!")
+    elif command == 'lock':
+        client.lock()
+        print("Vault locked")
+    else:
+        print(usage)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,30 @@
 import socket
+import errno
 import threading
-from queue import Queue
+import asyncio
+import argparse
+import ipaddress
+import sys
+import time
+from collections import deque
+from queue import Queue, Empty
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Only exists on Windows, where it is the default event loop
+ProactorEventLoop = getattr(asyncio, 'ProactorEventLoop', None)
+
+# Most commonly open TCP ports, most frequent first (nmap's top 100)
+TOP_PORTS = [
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306, 8080, 1723, 111, 995, 993, 5900,
+    1025, 587, 8888, 199, 1720, 465, 548, 113, 81, 6001, 10000, 514, 5060, 179, 1026, 2000, 8443, 8000, 32768, 554,
+    26, 1433, 49152, 2001, 515, 8008, 49154, 1027, 5666, 646, 5000, 5631, 631, 49153, 8081, 2049, 88, 79, 5800, 106,
+    2121, 1110, 49155, 6000, 513, 990, 5357, 427, 49156, 543, 544, 5101, 144, 7, 389, 8009, 3128, 444, 9999, 5009,
+    7070, 5190, 3000, 5432, 1900, 3986, 13, 1029, 9, 5051, 6646, 49157, 1028, 873, 1755, 2717, 4899, 9100, 119, 37,
+]
 
 def scan_port(target, port, open_ports):
     """Attempt to connect to a port, add to open_ports list if successful"""
@@ -14,18 +38,369 @@ def scan_port(target, port, open_ports):
     except:
         pass
 
+def _resolve(future, value):
+    """Set a future's result unless the timeout or the socket already did"""
+    if not future.done():
+        future.set_result(value)
+
+# Probe outcomes: a SYN-ACK, a RST, or no reply before the timeout
+OPEN, CLOSED, TIMEOUT = 'open', 'closed', 'timeout'
+
+async def probe_port_state(address, port, timeout=1):
+    """Try a TCP connect to (address, port), return (state, rtt_seconds)"""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    sock = None
+    try:
+        # Created inside the try, so running out of file descriptors (EMFILE)
+        # fails this one probe rather than the whole scan
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        if ProactorEventLoop is not None and isinstance(loop, ProactorEventLoop):
+            # Windows' default event loop has no add_writer, so let it run the
+            # whole connect instead (at the cost of a task per probe)
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, (address, port)), timeout)
+            except asyncio.TimeoutError:
+                return TIMEOUT, timeout
+            return OPEN, loop.time() - start
+
+        result = sock.connect_ex((address, port))
+        if result in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+            # Wait until the socket is writable (connect finished) or the timeout fires,
+            # using a plain future and timer instead of a task per probe
+            # (registered by fd, which is noticeably cheaper than by socket object)
+            fd = sock.fileno()
+            connected = loop.create_future()
+            loop.add_writer(fd, _resolve, connected, True)
+            timer = loop.call_later(timeout, _resolve, connected, False)
+            try:
+                if not await connected:
+                    return TIMEOUT, timeout
+                result = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            finally:
+                loop.remove_writer(fd)
+                timer.cancel()
+        return (OPEN if result == 0 else CLOSED), loop.time() - start
+    except OSError:
+        if sock is None:
+            # Never got to send anything, so report it like a lost probe,
+            # which gets retried later instead of marked closed
+            return TIMEOUT, timeout
+        return CLOSED, loop.time() - start
+    finally:
+        if sock is not None:
+            sock.close()
+
+async def probe_port(address, port, timeout=1):
+    """Return True if a TCP connect to (address, port) succeeds within timeout"""
+    state, _ = await probe_port_state(address, port, timeout)
+    return state == OPEN
+
+async def scan_port_async(target, port, open_ports, timeout=1):
+    """Non-blocking version of scan_port, add to open_ports list if the connect succeeds"""
+    if await probe_port(target, port, timeout):
+        open_ports.append(port)
+
+class HostTiming:
+    """Per-host RTT estimate used to pick probe timeouts (RFC 6298 style)"""
+    def __init__(self, max_timeout=1, min_timeout=0.05, min_samples=3):
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.min_samples = min_samples
+        self.samples = 0
+        self.srtt = None
+        self.rttvar = None
+
+    def add_sample(self, rtt):
+        self.samples += 1
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    def timeout(self, attempt=0):
+        """Timeout for a probe, doubling on each retry and capped at max_timeout"""
+        if self.samples < self.min_samples:
+            # Not enough replies yet to trust the estimate
+            return self.max_timeout
+        estimate = max(self.min_timeout, self.srtt + 4 * self.rttvar)
+        return min(self.max_timeout, estimate * 2 ** attempt)
+
+class AdaptiveLimit:
+    """Cap on probes in flight that backs off on loss (AIMD, like TCP congestion control)"""
+    def __init__(self, max_limit, min_limit=10, cooldown=0.5):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.cooldown = cooldown
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.backoffs = 0
+        self._last_backoff = 0.0
+        self._waiters = deque()
+
+    async def __aenter__(self):
+        # Plain futures rather than a Condition keep the common case (under the
+        # limit) free of any locking, since this runs once per probe
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+        self.in_flight += 1
+
+    async def __aexit__(self, *exc_info):
+        self.in_flight -= 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    def on_reply(self):
+        # Additive increase: about +1 for every `limit` replies
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_loss(self):
+        # Multiplicative decrease, at most once per cooldown so one burst of
+        # losses doesn't collapse the limit to the minimum
+        now = asyncio.get_running_loop().time()
+        if now - self._last_backoff >= self.cooldown:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self.backoffs += 1
+            self._last_backoff = now
+
+class ScanStats:
+    """Counters reported at the end of a batch scan"""
+    def __init__(self):
+        self.probes = 0
+        self.retries = 0
+        self.losses = 0
+        self.final_limit = 0
+
+async def scan_ports_async(target, ports, max_in_flight=1000, timeout=1, max_retries=2):
+    """Scan ports with up to max_in_flight connects outstanding at once, return open ports"""
+    # Resolve once up front instead of once per probe
+    address = socket.gethostbyname(target)
+    open_results = await scan_batch_async([address], ports, max_in_flight, timeout, max_retries=max_retries)
+    return [port for _, port in open_results]
+
+async def scan_batch_async(hosts, ports, max_in_flight=1000, timeout=1, on_open=None,
+                           max_retries=2, min_timeout=0.05, stats=None):
+    """Scan every (host, port) pair and return the open ones as a list of tuples
+
+    Probes are ordered port by port across all hosts, so consecutive probes
+    go to different hosts and no single host gets hammered. on_open(host, port)
+    is called as soon as each open port is found.
+
+    Each host's probe timeout follows its measured RTT once it has replied a
+    few times, with `timeout` as the ceiling. Probes that time out go to a
+    retry queue, which is only drawn from once fresh probes run out, with a
+    doubled timeout per attempt. Hosts that never reply at all are not
+    retried. A retry that gets a reply means the first probe was lost, which
+    halves the number of probes allowed in flight.
+    """
+    stats = stats if stats is not None else ScanStats()
+    open_results = []
+    probes = ((host, port) for port in ports for host in hosts)
+    retries = deque()
+    timings = {host: HostTiming(timeout, min_timeout) for host in hosts}
+    limit = AdaptiveLimit(max_in_flight)
+
+    # Workers park here when there's nothing to do yet but probes still in
+    # flight may add retries
+    idle_workers = []
+    active = 0
+
+    def wake_idle_workers():
+        for waiter in idle_workers:
+            if not waiter.done():
+                waiter.set_result(None)
+        idle_workers.clear()
+
+    def next_probe():
+        for host, port in probes:
+            return host, port, 0
+        while retries:
+            host, port, attempt = retries.popleft()
+            # A host that never replied to anything is filtered or down, and
+            # retrying it would only multiply the scan time
+            if timings[host].samples:
+                return host, port, attempt
+        return None
+
+    async def probe_worker():
+        nonlocal active
+        while True:
+            item = next_probe()
+            if item is None:
+                if active == 0:
+                    wake_idle_workers()
+                    return
+                waiter = asyncio.get_running_loop().create_future()
+                idle_workers.append(waiter)
+                await waiter
+                continue
+            active += 1
+
+            host, port, attempt = item
+            timing = timings[host]
+            try:
+                async with limit:
+                    state, rtt = await probe_port_state(host, port, timing.timeout(attempt))
+                stats.probes += 1
+
+                if state == TIMEOUT:
+                    if attempt < max_retries:
+                        retries.append((host, port, attempt + 1))
+                        stats.retries += 1
+                    continue
+
+                timing.add_sample(rtt)
+                if attempt > 0:
+                    # It answered this time, so the earlier probe was dropped
+                    stats.losses += 1
+                    limit.on_loss()
+                else:
+                    limit.on_reply()
+
+                if state == OPEN:
+                    open_results.append((host, port))
+                    if on_open:
+                        on_open(host, port)
+            finally:
+                active -= 1
+                if idle_workers:
+                    wake_idle_workers()
+
+    await asyncio.gather(*(probe_worker() for _ in range(max_in_flight)))
+    stats.final_limit = int(limit.limit)
+    return open_results
+
+def expand_targets(spec):
+    """Expand a target spec into a list of IPv4 addresses
+
+    Accepts comma or space separated CIDR blocks (10.0.0.0/24), address
+    ranges (10.0.0.1-10.0.0.50), single addresses, hostnames and @file
+    references to host lists with one entry per line.
+    """
+    hosts = []
+    for token in spec.replace(',', ' ').split():
+        if token.startswith('@'):
+            with open(token[1:], encoding='utf-8') as f:
+                lines = [line.split('#')[0].strip() for line in f]
+            hosts.extend(expand_targets(' '.join(line for line in lines if line)))
+        elif '/' in token:
+            network = ipaddress.IPv4Network(token, strict=False)
+            if network.num_addresses == 1:
+                hosts.append(str(network.network_address))
+            else:
+                hosts.extend(str(host) for host in network.hosts())
+        elif '-' in token and token.replace('-', '').replace('.', '').isdigit():
+            first, last = (ipaddress.IPv4Address(part) for part in token.split('-', 1))
+            hosts.extend(str(ipaddress.IPv4Address(n)) for n in range(int(first), int(last) + 1))
+        else:
+            # Resolve hostnames once up front instead of once per probe
+            hosts.append(socket.gethostbyname(token))
+
+    # Drop duplicates but keep the order they were given in
+    return list(dict.fromkeys(hosts))
+
+def expand_ports(spec):
+    """Expand a port spec like '22,80,8000-8100', 'top100' or 'all' into a list of ports"""
+    ports = []
+    for token in spec.replace(' ', '').split(','):
+        if not token:
+            continue
+        if token == 'all':
+            ports.extend(range(1, 65536))
+        elif token.startswith('top'):
+            ports.extend(TOP_PORTS[:int(token[3:] or len(TOP_PORTS))])
+        elif '-' in token:
+            first, last = token.split('-', 1)
+            ports.extend(range(int(first), int(last) + 1))
+        else:
+            ports.append(int(token))
+
+    for port in ports:
+        if not 1 <= port <= 65535:
+            raise ValueError(f"Invalid port: {port}")
+    return list(dict.fromkeys(ports))
+
+def batch_scan(target_spec, port_spec, max_in_flight=1000, timeout=1, max_retries=2):
+    """Scan many hosts and ports, print open ports as they are found, return them"""
+    hosts = expand_targets(target_spec)
+    ports = expand_ports(port_spec)
+    total = len(hosts) * len(ports)
+    max_in_flight = raise_fd_limit(min(max_in_flight, total) or 1)
+
+    print(f"Scanning {len(hosts)} hosts x {len(ports)} ports ({total} probes) "
+          f"with up to {max_in_flight} connections in flight...\n")
+
+    def report_open(host, port):
+        print(f"{host}:{port} open", flush=True)
+
+    stats = ScanStats()
+    start_time = time.perf_counter()
+    open_results = asyncio.run(scan_batch_async(hosts, ports, max_in_flight, timeout, report_open,
+                                                max_retries=max_retries, stats=stats))
+    elapsed = time.perf_counter() - start_time
+
+    rate = stats.probes / elapsed if elapsed else 0.0
+    print(f"\n{len(open_results)} open ports found. {stats.probes} probes in {elapsed:.2f} seconds ({rate:.0f} probes/s)")
+    print(f"Retries: {stats.retries}, lost probes: {stats.losses}, final in-flight limit: {stats.final_limit}")
+    return open_results
+
+def raise_fd_limit(needed):
+    """Raise the open-file soft limit so we can hold `needed` sockets at once"""
+    if resource is None:
+        return needed
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    # Leave some headroom for stdin/stdout and anything else the process has open
+    wanted = needed + 64
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        new_soft = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+            soft = new_soft
+        except (ValueError, OSError):
+            pass
+    if soft == resource.RLIM_INFINITY:
+        return needed
+    return max(1, min(needed, soft - 64))
+
 def port_scanner():
     # Get user input
     target = input("Enter the target IP address: ")
     start_port = int(input("Enter the starting port: "))
     end_port = int(input("Enter the ending port: "))
+    in_flight_input = input("Maximum connections in flight (default: 1000): ").strip()
+    max_in_flight = int(in_flight_input) if in_flight_input.isdigit() else 1000
 
-    print(f"\nScanning {target} for open ports...\n")
+    # Make sure the OS lets us keep that many sockets open
+    max_in_flight = raise_fd_limit(max_in_flight)
+
+    print(f"\nScanning {target} for open ports with up to {max_in_flight} connections in flight...\n")
+
+    start_time = time.perf_counter()
+    open_ports = asyncio.run(scan_ports_async(target, range(start_port, end_port + 1), max_in_flight))
+    elapsed = time.perf_counter() - start_time
+
+    # Print results
+    if open_ports:
+        print("Open ports found:")
+        for port in sorted(open_ports):
+            print(f"Port {port} is open")
+    else:
+        print("No open ports found in the specified range.")
+    print(f"\nScanned {end_port - start_port + 1} ports in {elapsed:.2f} seconds")
 
+def threaded_port_scanner(target, start_port, end_port, num_threads=100):
+    """Original thread-per-worker scanner, return open ports"""
     # Create a queue to hold the ports and a list for open ports
     port_queue = Queue()
     open_ports = []
-    print(open_ports)
 
     # Add ports to the queue
     for port in range(start_port, end_port + 1):
@@ -33,7 +408,7 @@ def port_scanner():
 
     # Create and start threads
     thread_list = []
-    for _ in range(100):  # Use 100 threads for faster scanning
+    for _ in range(num_threads):
         thread = threading.Thread(target=worker, args=(target, port_queue, open_ports))
         thread_list.append(thread)
         thread.start()
@@ -42,13 +417,7 @@ def port_scanner():
     for thread in thread_list:
         thread.join()
 
-    # Print results
-    if open_ports:
-        print("Open ports found:")
-        for port in sorted(open_ports):
-            print(f"Port {port} is open")
-    else:
-        print("No open ports found in the specified range.")
+    return open_ports
 
 def worker(target, port_queue, open_ports):
     """Worker function for threads to process ports from the queue"""
@@ -57,8 +426,26 @@ def worker(target, port_queue, open_ports):
             port = port_queue.get_nowait()
             scan_port(target, port, open_ports)
             port_queue.task_done()
-        except Queue.Empty:
+        except Empty:
             break
 
+def main():
+    if len(sys.argv) == 1:
+        # No arguments, so ask interactively for a single target
+        port_scanner()
+        return
+
+    parser = argparse.ArgumentParser(description="Scan hosts and subnets for open TCP ports")
+    parser.add_argument("targets", nargs="+", help="IPs, hostnames, CIDR blocks, ranges or @file host lists")
+    parser.add_argument("-p", "--ports", default="top100",
+                        help="ports, ranges and presets, e.g. 22,80,8000-8100, top20 or all (default: top100)")
+    parser.add_argument("--in-flight", type=int, default=1000, help="maximum connections in flight (default: 1000)")
+    parser.add_argument("--timeout", type=float, default=1.0,
+                        help="maximum connect timeout in seconds, lowered per host from measured RTT (default: 1)")
+    parser.add_argument("--retries", type=int, default=2, help="retries for probes that time out (default: 2)")
+    args = parser.parse_args()
+
+    batch_scan(" ".join(args.targets), args.ports, args.in_flight, args.timeout, args.retries)
+
 if __name__ == "__main__":
-    port_scanner()
+    main()
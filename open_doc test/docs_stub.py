@@ -0,0 +1,136 @@
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+BATCH_UPDATE_PATH = re.compile(r'^/v1/documents/([^/:]+):batchUpdate$')
+GET_PATH = re.compile(r'^/v1/documents/([^/:]+)$')
+
+
+class StubDocsHandler(BaseHTTPRequestHandler):
+    """Answers the Docs API calls making_doc.py uses: create, batchUpdate and get"""
+    # Keep-alive and no Nagle delay, so the stub doesn't add latency of its own
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        self.server.simulate_latency()
+
+        if path == '/v1/documents':
+            self._reply(200, self.server.create(body.get('title', 'Untitled document')))
+            return
+
+        match = BATCH_UPDATE_PATH.match(path)
+        if match:
+            result = self.server.batch_update(match.group(1), body.get('requests', []))
+            if result is None:
+                self._reply(404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}})
+            else:
+                self._reply(200, result)
+            return
+
+        self._reply(404, {'error': {'code': 404, 'message': f'Unknown path {path}'}})
+
+    def do_GET(self):
+        match = GET_PATH.match(urlsplit(self.path).path)
+        doc = self.server.documents.get(match.group(1)) if match else None
+        if doc is None:
+            self._reply(404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}})
+            return
+        self._reply(200, doc)
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubDocsServer(ThreadingHTTPServer):
+    """In-memory stand-in for the Google Docs API, for testing without OAuth or network
+
+    Documents only keep their title and plain text, which is all the
+    insertText requests from making_doc.py touch. Every call waits
+    `latency` seconds to mimic a round trip to the real API.
+    """
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0):
+        super().__init__(address, StubDocsHandler)
+        self.latency = latency
+        self.documents = {}
+        self.calls = {'create': 0, 'batchUpdate': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def endpoint(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def simulate_latency(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def create(self, title):
+        doc = {'documentId': uuid.uuid4().hex, 'title': title, 'text': '\n'}
+        with self._lock:
+            self.documents[doc['documentId']] = doc
+            self.calls['create'] += 1
+        return {'documentId': doc['documentId'], 'title': title}
+
+    def batch_update(self, document_id, requests):
+        with self._lock:
+            doc = self.documents.get(document_id)
+            if doc is None:
+                return None
+            self.calls['batchUpdate'] += 1
+            for request in requests:
+                insert = request.get('insertText')
+                if insert is None:
+                    continue
+                text = doc['text']
+                if 'endOfSegmentLocation' in insert:
+                    # The body always ends with a newline that text goes in front of
+                    doc['text'] = text[:-1] + insert['text'] + text[-1:]
+                else:
+                    index = insert['location']['index'] - 1
+                    doc['text'] = text[:index] + insert['text'] + text[index:]
+        return {'documentId': document_id, 'replies': [{} for _ in requests],
+                'writeControl': {'requiredRevisionId': uuid.uuid4().hex}}
+
+    def start(self):
+        """Serve on a background thread and return the endpoint URL"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.endpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the Google Docs API")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every call (default: 0.05)")
+    args = parser.parse_args()
+
+    server = StubDocsServer(('127.0.0.1', args.port), latency=args.latency)
+    print(f"Stub Docs API on {server.endpoint} (use: making_doc.py --endpoint {server.endpoint} ...)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served {server.calls['create']} creates and {server.calls['batchUpdate']} batch updates")
+
+
+if __name__ == '__main__':
+    main()
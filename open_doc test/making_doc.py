@@ -1,9 +1,18 @@
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.credentials import AnonymousCredentials
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import google_auth_httplib2
+import httplib2
+import argparse
 import os
+import sys
 import json
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load credentials from .env
@@ -11,45 +20,230 @@ load_dotenv()
 
 SCOPES = ['https://www.googleapis.com/auth/documents']
 
-def get_credentials():
-    creds = None
-    # Load credentials from .env
-    creds_json = json.loads(os.getenv('GOOGLE_CREDENTIALS_JSON'))
-    
-    flow = InstalledAppFlow.from_client_config(creds_json, SCOPES)
-    creds = flow.run_local_server(port=0)
-    return creds
-
-def create_doc(title, content):
-    """Create a new Google Doc with the given title and content."""
-    creds = get_credentials()
-    service = build('docs', 'v1', credentials=creds)
-    
-    # Create a new document
-    doc = service.documents().create(body={'title': title}).execute()
-    
-    # Insert text into the document
+# Where the OAuth token is cached between runs, so the browser flow only runs once
+TOKEN_FILE = os.getenv('GOOGLE_TOKEN_FILE', 'token.json')
+
+# Characters of text per insertText request. One document's content goes in
+# as few batchUpdate calls as possible, each kept well under the API's
+# request size limit.
+MAX_INSERT_CHARS = 500000
+
+# Retries (with exponential backoff) for rate limits and server errors
+NUM_RETRIES = 5
+
+_credentials = None
+_credentials_lock = threading.Lock()
+_services = {}
+_thread_local = threading.local()
+
+
+def get_credentials(token_file=TOKEN_FILE):
+    """Return OAuth credentials, from memory, the token cache or the browser flow
+
+    A cached token is refreshed when it has expired; the full
+    InstalledAppFlow only runs when there is no usable token at all,
+    including when the refresh token has been revoked or expired.
+    """
+    global _credentials
+    with _credentials_lock:
+        creds = _credentials
+        if creds is None and os.path.exists(token_file):
+            creds = Credentials.from_authorized_user_file(token_file, SCOPES)
+
+        if creds is None or not creds.valid:
+            if creds is not None and creds.expired and creds.refresh_token:
+                try:
+                    creds.refresh(Request())
+                except RefreshError:
+                    # Revoked or expired refresh token, log in again below
+                    creds = None
+
+            if creds is None or not creds.valid:
+                # Load credentials from .env
+                creds_json = json.loads(os.getenv('GOOGLE_CREDENTIALS_JSON'))
+                flow = InstalledAppFlow.from_client_config(creds_json, SCOPES)
+                creds = flow.run_local_server(port=0)
+
+            # The token grants access to the user's documents, keep it private
+            fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            os.fchmod(fd, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(creds.to_json())
+
+        _credentials = creds
+        return creds
+
+
+def _client(endpoint=None):
+    # (service, documents resource, credentials) for an endpoint, built once and
+    # shared by all threads. service.documents() renders the API schema into
+    # docstrings every time it is called, which costs more CPU than the request
+    # itself, so the resource is kept too.
+    with _credentials_lock:
+        client = _services.get(endpoint)
+    if client is None:
+        if endpoint:
+            creds = AnonymousCredentials()
+            service = build('docs', 'v1', credentials=creds, static_discovery=True,
+                            client_options={'api_endpoint': endpoint})
+        else:
+            creds = get_credentials()
+            service = build('docs', 'v1', credentials=creds, static_discovery=True)
+        with _credentials_lock:
+            client = _services.setdefault(endpoint, (service, service.documents(), creds))
+    return client
+
+
+def get_service(endpoint=None):
+    """Return the Docs service client, built once per endpoint
+
+    With an endpoint (e.g. a local docs_stub.py server) no OAuth is done
+    and requests go there instead of to Google.
+    """
+    return _client(endpoint)[0]
+
+
+def _thread_http(creds):
+    # httplib2 connections aren't thread-safe, so each worker thread gets its
+    # own authorized connection while sharing the one service object
+    http = getattr(_thread_local, 'http', None)
+    if http is None:
+        http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+        _thread_local.http = http
+    return http
+
+
+def build_requests(content):
+    """Turn document content into batchUpdate payloads, as few as possible
+
+    Content can be a string or a list of paragraphs. All of it is
+    coalesced into one insertText request per MAX_INSERT_CHARS, appended
+    at the end of the body so the chunks don't need index arithmetic,
+    and all requests go in a single payload.
+    """
+    if isinstance(content, (list, tuple)):
+        content = '\n'.join(content)
+    if not content:
+        return []
+
     requests = [{
         'insertText': {
-            'location': {
-                'index': 1
-            },
-            'text': content
+            'endOfSegmentLocation': {},
+            'text': content[start:start + MAX_INSERT_CHARS]
         }
-    }]
-    
-    service.documents().batchUpdate(
-        documentId=doc.get('documentId'),
-        body={'requests': requests}
-    ).execute()
-    
-    print(f"Created document with ID: {doc.get('documentId')}")
-    print(f"View your document at: https://docs.google.com/document/d/{doc.get('documentId')}")
+    } for start in range(0, len(content), MAX_INSERT_CHARS)]
+    return [requests]
+
+
+def create_doc(title, content, endpoint=None):
+    """Create a new Google Doc with the given title and content, and return its ID"""
+    _, documents, creds = _client(endpoint)
+    http = _thread_http(creds)
+
+    # Create a new document
+    doc = documents.create(body={'title': title}).execute(http=http, num_retries=NUM_RETRIES)
+    document_id = doc.get('documentId')
+
+    # Insert text into the document
+    for requests in build_requests(content):
+        documents.batchUpdate(
+            documentId=document_id,
+            body={'requests': requests}
+        ).execute(http=http, num_retries=NUM_RETRIES)
+
+    return document_id
+
+
+def read_directory(path):
+    """Yield one document per file in a directory, titled after the file name"""
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.join(path, name)
+        if os.path.isfile(file_path) and not name.startswith('.'):
+            with open(file_path, encoding='utf-8') as f:
+                yield {'title': os.path.splitext(name)[0], 'content': f.read()}
+
+
+def read_jsonl(path):
+    """Yield documents from a JSONL file ('-' for stdin) of {"title": ..., "content": ...} lines"""
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def create_docs(documents, workers=8, endpoint=None):
+    """Create many documents concurrently, yielding (title, document ID or None, error)
+
+    Documents are read lazily and at most 2 * workers are in flight, so
+    an arbitrarily long stream never sits in memory. Credentials and the
+    service client are set up once, before any worker starts.
+    """
+    get_service(endpoint)
+    documents = iter(documents)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        while True:
+            for doc in documents:
+                future = executor.submit(create_doc, doc['title'], doc.get('content', ''), endpoint)
+                pending[future] = doc['title']
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                title = pending.pop(future)
+                try:
+                    yield title, future.result(), None
+                except Exception as e:
+                    yield title, None, e
+
+
+def bulk_main(args):
+    if args.dir:
+        documents = read_directory(args.dir)
+    else:
+        documents = read_jsonl(args.jsonl)
+
+    start = time.perf_counter()
+    created = failed = 0
+    for title, document_id, error in create_docs(documents, args.workers, args.endpoint):
+        if error is None:
+            created += 1
+            print(f"{title}: https://docs.google.com/document/d/{document_id}")
+        else:
+            failed += 1
+            print(f"{title}: failed: {error}")
+
+    elapsed = time.perf_counter() - start
+    rate = created / elapsed if elapsed else 0.0
+    print(f"\nCreated {created} documents ({failed} failed) in {elapsed:.2f} seconds ({rate:.1f}/s)")
+    if failed:
+        sys.exit(1)
+
 
 def main():
+    if len(sys.argv) > 1:
+        parser = argparse.ArgumentParser(description="Create Google Docs in bulk")
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--dir', help="create one document per file in this directory")
+        source.add_argument('--jsonl', help="read {\"title\", \"content\"} lines from this file ('-' for stdin)")
+        parser.add_argument('--workers', type=int, default=8, help="documents created in parallel (default: 8)")
+        parser.add_argument('--endpoint', help="Docs API endpoint, e.g. a local docs_stub.py server")
+        bulk_main(parser.parse_args())
+        return
+
     title = input("Enter document title: ")
     content = input("Enter document content: ")
-    create_doc(title, content)
+    document_id = create_doc(title, content)
+    print(f"Created document with ID: {document_id}")
+    print(f"View your document at: https://docs.google.com/document/d/{document_id}")
+
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()